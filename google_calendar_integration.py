@@ -5,7 +5,6 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-import pickle
 
 class GoogleCalendarAPIExecutor:
     """API executor implementation for Google Calendar integration"""
@@ -34,8 +33,7 @@ class GoogleCalendarAPIExecutor:
         
         # Load token from file if it exists
         if os.path.exists(self.token_path):
-            with open(self.token_path, 'r') as token:
-                creds = Credentials.from_authorized_user_file(self.token_path, self.SCOPES)
+            creds = Credentials.from_authorized_user_file(self.token_path, self.SCOPES)
         
         # If there are no (valid) credentials available, let the user log in.
         if not creds or not creds.valid:
@@ -46,9 +44,11 @@ class GoogleCalendarAPIExecutor:
                     self.credentials_path, self.SCOPES)
                 creds = flow.run_local_server(port=0)
             
-            # Save the credentials for the next run
-            with open(self.token_path, 'w') as token:
+            # Save the credentials for the next run, swapping the file in atomically
+            tmp_path = f'{self.token_path}.tmp'
+            with open(tmp_path, 'w') as token:
                 token.write(creds.to_json())
+            os.replace(tmp_path, self.token_path)
         
         # Build the services
         self.calendar_service = build('calendar', 'v3', credentials=creds)
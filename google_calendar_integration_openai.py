@@ -1,32 +1,175 @@
 import os
-from datetime import datetime, timedelta, date
-from typing import Dict, Any, List
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from dotenv import load_dotenv
-import openai
+import json
+import sys
+import random
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, date, timezone, tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from typing import Dict, Any, List, Tuple, TYPE_CHECKING
+from sync_store import SyncStore
 
-load_dotenv()
+# The Google client libraries are imported where they are first needed; together they
+# add a few hundred milliseconds to import time for callers that never authenticate.
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+# ciso8601 is an optional C parser; fromisoformat accepts a trailing 'Z' natively from Python 3.11
+try:
+    from ciso8601 import parse_datetime as _parse_datetime
+except ImportError:
+    if sys.version_info >= (3, 11):
+        _parse_datetime = datetime.fromisoformat
+    else:
+        def _parse_datetime(value: str) -> datetime:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+logger = logging.getLogger("meeting_agent")
+
+HTTP_TIMEOUT = 30
+# Holds the user's contacts and events, so it lives in the user's cache dir, never the working tree
+CALENDAR_CACHE_PATH = os.path.expanduser("~/.cache/meeting_agent/calendar_cache.db")
+
+# Authorized service objects keyed by token path, shared by every executor in the process.
+_SERVICE_CACHE: Dict[str, Tuple[Any, Any, "Credentials"]] = {}
+
+
+# 403 reasons that mean "over quota", compared case-insensitively without underscores
+# (Calendar says rateLimitExceeded, People's ErrorInfo says RATE_LIMIT_EXCEEDED)
+_QUOTA_REASONS = frozenset({'ratelimitexceeded', 'userratelimitexceeded', 'quotaexceeded'})
+
+
+def _error_reasons(error: Exception) -> set:
+    try:
+        body = json.loads(getattr(error, 'content', None) or b'{}')
+    except (TypeError, ValueError):
+        return set()
+    body = body[0] if isinstance(body, list) and body else body
+    details = body.get('error', {}) if isinstance(body, dict) else {}
+    if not isinstance(details, dict):
+        return set()
+    entries = (details.get('errors') or []) + (details.get('details') or [])
+    return {str(entry.get('reason', '')).replace('_', '').lower() for entry in entries if isinstance(entry, dict)}
+
+
+def _is_backend_error(error: Exception) -> bool:
+    # Outages, throttling and lost authorisation: the backend cannot serve anything until they
+    # clear, as opposed to a request it answered and refused
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if isinstance(status, int):
+        if status == 403:
+            return bool(_error_reasons(error) & _QUOTA_REASONS)
+        return status in (401, 429) or status >= 500
+    try:
+        from google.auth.exceptions import RefreshError
+    except ImportError:
+        pass
+    else:
+        if isinstance(error, RefreshError):
+            return True
+    try:
+        import httplib2
+    except ImportError:
+        return False
+    return isinstance(error, httplib2.HttpLib2Error)
+
+
+def _make_request_builder(creds: "Credentials"):
+    import httplib2
+    import google_auth_httplib2
+    from googleapiclient.http import HttpRequest
+
+    # httplib2.Http is not thread-safe, so each thread keeps its own keep-alive connection
+    # pool, shared by every service built with this builder.
+    local = threading.local()
+
+    def build_request(http, *args, **kwargs):
+        authed_http = getattr(local, 'http', None)
+        if authed_http is None:
+            authed_http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+            local.http = authed_http
+        return HttpRequest(authed_http, *args, **kwargs)
+    return build_request
 
 
 class GoogleCalendarAPIExecutor:
     SCOPES = ['https://www.googleapis.com/auth/calendar', 
               'https://www.googleapis.com/auth/contacts.readonly']
+    CONTACT_FIELDS = 'names,emailAddresses,phoneNumbers'
+    # Partial-response masks: only the values we actually read are returned
+    PERSON_MASK = 'names/displayName,emailAddresses/value,phoneNumbers/value'
+    CONNECTIONS_MASK = ('connections(resourceName,metadata/deleted,names/displayName,emailAddresses/value),'
+                        'nextPageToken,nextSyncToken')
+    CONTACTS_CACHE_TTL = 300
+    EVENTS_SYNC_TTL = 60
+    EVENTS_MASK = ('items(id,status,transparency,start,end,attendees(self,responseStatus)),'
+                   'nextPageToken,nextSyncToken,timeZone')
+    # Full syncs start this far back, so the local copy only answers queries from then on
+    EVENTS_SYNC_LOOKBACK = timedelta(days=1)
+    # (api, action) -> handler method name; bound once per instance in __init__
+    _DISPATCH = {
+        ("contacts", "find_contact"): "_handle_find_contact",
+        ("contacts", "get_contact_details"): "_handle_get_contact_details",
+        ("calendar", "check_availability"): "_handle_check_availability",
+        ("calendar", "get_free_slots"): "_handle_get_free_slots",
+        ("calendar", "book_meeting"): "_handle_book_meeting",
+        ("calendar", "book_meetings"): "_handle_book_meetings",
+        ("preferences", "get_meeting_preferences"): "_handle_get_meeting_preferences",
+    }
+    _APIS = frozenset(api for api, _ in _DISPATCH)
+    CONTACT_CACHE_SIZE = 256
+    PEOPLE_BATCH_LIMIT = 200
+    CALENDAR_BATCH_LIMIT = 50
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    MAX_ATTEMPTS = 5
+    MAX_BACKOFF = 32
     
-    def __init__(self, credentials_path: str, token_path: str = 'token.json'):
+    def __init__(self, credentials_path: str, token_path: str = 'token.json',
+                 cache_path: str = CALENDAR_CACHE_PATH):
         self.credentials_path = credentials_path
         self.token_path = token_path
+        self._store = SyncStore(cache_path) if cache_path else None
         self.calendar_service = None
         self.people_service = None
+        self._creds = None
+        self._contact_cache = OrderedDict()
+        self._contact_cache_lock = threading.Lock()
+        self._contacts_cache = None
+        self._contacts_cache_ts = 0.0
+        self._contacts_sync_token = None
+        self._contacts_cache_lock = threading.Lock()
+        self._events_sync_lock = threading.Lock()
+        self._events_stale = False
+        self._handlers = {key: getattr(self, name) for key, name in self._DISPATCH.items()}
+        # Events are synced on first use or via warm_cache(), never during construction
         self._authenticate()
     
     def _authenticate(self):
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from google.auth.transport.requests import Request
+        from googleapiclient.discovery import build
+
+        cached = _SERVICE_CACHE.get(self.token_path)
+        if cached:
+            calendar_service, people_service, creds = cached
+            if creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+                self._save_token(creds)
+            if creds.valid:
+                self._creds = creds
+                self.calendar_service = calendar_service
+                self.people_service = people_service
+                return
+
         creds = None
         if os.path.exists(self.token_path):
-            with open(self.token_path, 'r') as token:
-                creds = Credentials.from_authorized_user_file(self.token_path, self.SCOPES)
+            creds = Credentials.from_authorized_user_file(self.token_path, self.SCOPES)
         
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
@@ -36,112 +179,368 @@ class GoogleCalendarAPIExecutor:
                     self.credentials_path, self.SCOPES)
                 creds = flow.run_local_server(port=0)
             
-            with open(self.token_path, 'w') as token:
-                token.write(creds.to_json())
+            self._save_token(creds)
         
-        self.calendar_service = build('calendar', 'v3', credentials=creds)
-        self.people_service = build('people', 'v1', credentials=creds)
+        # static_discovery reads the bundled discovery documents instead of fetching them
+        request_builder = _make_request_builder(creds)
+        self._creds = creds
+        self.calendar_service = build('calendar', 'v3', credentials=creds,
+                                      requestBuilder=request_builder, static_discovery=True)
+        self.people_service = build('people', 'v1', credentials=creds,
+                                    requestBuilder=request_builder, static_discovery=True)
+        _SERVICE_CACHE[self.token_path] = (self.calendar_service, self.people_service, creds)
+
+    def _save_token(self, creds: "Credentials"):
+        # Write to a temporary file and swap it in so a crash never leaves a truncated token
+        tmp_path = f'{self.token_path}.tmp'
+        with open(tmp_path, 'w') as token:
+            token.write(creds.to_json())
+        os.replace(tmp_path, self.token_path)
+
+    def _execute_with_retry(self, request):
+        # Only used for reads: retrying an insert after a 5xx could create the event twice
+        from googleapiclient.errors import HttpError
+
+        for attempt in range(self.MAX_ATTEMPTS):
+            try:
+                return request.execute()
+            except HttpError as e:
+                if e.resp.status not in self.RETRY_STATUSES or attempt == self.MAX_ATTEMPTS - 1:
+                    raise
+                try:
+                    delay = int(e.resp.get('retry-after', 0))
+                except ValueError:
+                    delay = 0
+                if delay > self.MAX_BACKOFF:
+                    # Blocking a worker (and the user) for longer than this is worse than failing now
+                    raise
+                time.sleep(delay or min(2 ** attempt + random.random(), self.MAX_BACKOFF))
+
+    async def execute_async(self, api_name: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.execute, api_name, action, params)
     
     def execute(self, api_name: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        if api_name == "contacts":
-            return self._execute_contacts_api(action, params)
-        elif api_name == "calendar":
-            return self._execute_calendar_api(action, params)
-        elif api_name == "preferences":
-            return self._execute_preferences_api(action, params)
-        else:
-            return {"success": False, "error": f"Unknown API: {api_name}"}
+        handler = self._handlers.get((api_name, action))
+        if handler is not None:
+            return handler(params)
+        if api_name in self._APIS:
+            return {"success": False, "error": f"Unknown {api_name} action: {action}"}
+        return {"success": False, "error": f"Unknown API: {api_name}"}
     
-    def _execute_contacts_api(self, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        if action == "find_contact":
-            return self._find_contact(params["name"])
-        elif action == "get_contact_details":
-            return self._get_contact_details(params["contact_id"])
-        else:
-            return {"success": False, "error": f"Unknown contacts action: {action}"}
+    def _error_result(self, message: str, error: Exception) -> Dict[str, Any]:
+        result = {"success": False, "error": f"{message}: {str(error)}"}
+        if _is_backend_error(error):
+            # Lets callers tell an outage apart from an ordinary miss
+            result["backend_error"] = True
+        return result
+
+    def _handle_find_contact(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._find_contact(params["name"])
+
+    def _handle_get_contact_details(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._get_contact_details(params["contact_id"])
     
     def _find_contact(self, name: str) -> Dict[str, Any]:
         try:
-            query = name.lower()
-            results = self.people_service.people().connections().list(
-                resourceName='people/me',
-                pageSize=100,
-                personFields='names,emailAddresses',
-                sortOrder='FIRST_NAME_ASCENDING'
-            ).execute()
+            query = name.casefold()
+            index = self._ensure_contacts_cache()
             
-            connections = results.get('connections', [])
-            matching_contacts = []
-            for person in connections:
-                names = person.get('names', [])
-                for name_obj in names:
-                    display_name = name_obj.get('displayName', '').lower()
-                    
-                    if query in display_name:
-                        matching_contacts.append({
-                            'contact_id': person['resourceName'].split('/')[-1],
-                            'name': name_obj.get('displayName', ''),
-                            'email': person.get('emailAddresses', [{}])[0].get('value', '')
-                        })
-                        break
-            
-            if matching_contacts:
-                contact = matching_contacts[0]
+            contact = index['by_lower_name'].get(query)
+            if contact is None:
+                contact = next((c for display_name, c in index['by_lower_name'].items()
+                                if query in display_name), None)
+            
+            if contact is not None:
                 return {
                     "success": True,
                     "contact_id": contact['contact_id'],
                     "name": contact['name'],
                     "email": contact['email']
                 }
-            else:
-                return {"success": False, "error": f"No contact found with name '{name}'"}
+            return self._search_contacts(name)
                 
         except Exception as e:
-            return {"success": False, "error": f"Error finding contact: {str(e)}"}
-    
-    def _get_contact_details(self, contact_id: str) -> Dict[str, Any]:
-        try:
-            person = self.people_service.people().get(
-                resourceName=f'people/{contact_id}',
-                personFields='names,emailAddresses,phoneNumbers'
-            ).execute()
-            
+            return self._error_result("Error finding contact", e)
+
+    def _search_contacts(self, name: str) -> Dict[str, Any]:
+        results = self._execute_with_retry(self.people_service.people().searchContacts(
+            query=name,
+            pageSize=1,
+            readMask='names,emailAddresses',
+            fields='results/person(resourceName,names/displayName,emailAddresses/value)'
+        ))
+        
+        for result in results.get('results', []):
+            person = result.get('person', {})
             names = person.get('names', [])
             emails = person.get('emailAddresses', [])
-            phones = person.get('phoneNumbers', [])
-            
             return {
                 "success": True,
-                "contact_id": contact_id,
+                "contact_id": person['resourceName'].split('/')[-1],
                 "name": names[0].get('displayName', '') if names else '',
-                "email": emails[0].get('value', '') if emails else '',
-                "phone": phones[0].get('value', '') if phones else ''
+                "email": emails[0].get('value', '') if emails else ''
             }
+        return {"success": False, "error": f"No contact found with name '{name}'"}
+
+    def _ensure_contacts_cache(self) -> Dict[str, Dict[str, Any]]:
+        from googleapiclient.errors import HttpError
+
+        with self._contacts_cache_lock:
+            if (self._contacts_cache is not None
+                    and time.monotonic() - self._contacts_cache_ts < self.CONTACTS_CACHE_TTL):
+                return self._contacts_cache
+            
+            if self._contacts_cache is not None:
+                by_id = dict(self._contacts_cache['by_id'])
+            elif self._store is not None:
+                # Resume from the contacts persisted by a previous run
+                by_id, self._contacts_sync_token = self._store.load_contacts()
+            else:
+                by_id = {}
+            
+            full = not self._contacts_sync_token
+            try:
+                people, sync_token = self._list_connections(self._contacts_sync_token)
+            except HttpError as e:
+                # An expired sync token means the delta is gone; start over with a full sync
+                if full or e.resp.status not in (400, 410):
+                    raise
+                by_id = {}
+                full = True
+                people, sync_token = self._list_connections(None)
+            
+            upserts = []
+            deletes = []
+            for person in people:
+                contact_id = person['resourceName'].split('/')[-1]
+                if person.get('metadata', {}).get('deleted'):
+                    by_id.pop(contact_id, None)
+                    deletes.append(contact_id)
+                    continue
+                by_id[contact_id] = {
+                    'contact_id': contact_id,
+                    'names': tuple(n.get('displayName', '') for n in person.get('names') or ()),
+                    'email': next((e.get('value', '') for e in person.get('emailAddresses') or ()), '')
+                }
+                upserts.append(by_id[contact_id])
+            
+            if self._store is not None:
+                self._store.apply_contacts(upserts, deletes, sync_token, full=full)
+            
+            by_lower_name = {}
+            for entry in by_id.values():
+                for display_name in entry['names']:
+                    by_lower_name.setdefault(display_name.casefold(), {
+                        'contact_id': entry['contact_id'],
+                        'name': display_name,
+                        'email': entry['email']
+                    })
+            
+            self._contacts_cache = {'by_lower_name': by_lower_name, 'by_id': by_id}
+            self._contacts_sync_token = sync_token
+            self._contacts_cache_ts = time.monotonic()
+            return self._contacts_cache
+
+    def warm_cache(self):
+        # Local availability answers always come from the authorised user's primary calendar
+        self._ensure_contacts_cache()
+        if self._store is not None:
+            self._sync_events_if_due()
+
+    def _sync_events_if_due(self):
+        # An incremental sync is a small delta, far cheaper than re-querying Google
+        with self._events_sync_lock:
+            _, synced_at = self._store.get_sync_state('events:primary')
+            if self._events_stale or time.time() - synced_at > self.EVENTS_SYNC_TTL:
+                self._sync_events('primary')
+                self._events_stale = False
+
+    def _list_connections(self, sync_token: str = None) -> Tuple[List[Dict[str, Any]], str]:
+        people = []
+        page_token = None
+        while True:
+            results = self._execute_with_retry(self.people_service.people().connections().list(
+                resourceName='people/me',
+                pageSize=1000,
+                personFields='names,emailAddresses,metadata',
+                sortOrder='FIRST_NAME_ASCENDING',
+                requestSyncToken=True,
+                syncToken=sync_token,
+                pageToken=page_token,
+                fields=self.CONNECTIONS_MASK
+            ))
+            
+            people.extend(results.get('connections', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return people, results.get('nextSyncToken')
+    
+    def _sync_events(self, calendar_id: str):
+        from googleapiclient.errors import HttpError
+
+        sync_token, _ = self._store.get_sync_state(f'events:{calendar_id}')
+        full = not sync_token
+        try:
+            events = self._list_events(calendar_id, sync_token)
+        except HttpError as e:
+            # 410 GONE: the sync token expired, so the local copy must be rebuilt
+            if full or e.resp.status != 410:
+                raise
+            full = True
+            events = self._list_events(calendar_id, None)
+        items, next_sync_token, time_zone = events
+        # All-day events span midnight to midnight in the calendar's own zone, as in FreeBusy
+        day_zone = self._zone(time_zone)
+        
+        upserts = []
+        deletes = []
+        for event in items:
+            # Free (transparent) and declined events never block a slot, matching FreeBusy
+            declined = any(a.get('self') and a.get('responseStatus') == 'declined'
+                           for a in event.get('attendees', ()))
+            if (event.get('status') == 'cancelled' or event.get('transparency') == 'transparent'
+                    or declined):
+                deletes.append(event['id'])
+                continue
+            upserts.append((event['id'], self._event_timestamp(event['start'], day_zone),
+                            self._event_timestamp(event['end'], day_zone)))
+        self._store.apply_events(calendar_id, upserts, deletes, next_sync_token, full=full)
+
+    def _list_events(self, calendar_id: str, sync_token: str = None) -> Tuple[List[Dict[str, Any]], str, str]:
+        # Full syncs start a day back; incremental syncs may not combine timeMin with syncToken
+        time_min = None
+        if not sync_token:
+            time_min = (datetime.now(timezone.utc) - self.EVENTS_SYNC_LOOKBACK).isoformat()
+        items = []
+        page_token = None
+        while True:
+            results = self._execute_with_retry(self.calendar_service.events().list(
+                calendarId=calendar_id,
+                maxResults=2500,
+                singleEvents=True,
+                timeMin=time_min,
+                syncToken=sync_token,
+                pageToken=page_token,
+                fields=self.EVENTS_MASK
+            ))
+            
+            items.extend(results.get('items', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return items, results.get('nextSyncToken'), results.get('timeZone')
+
+    def _zone(self, time_zone: str = None) -> tzinfo:
+        try:
+            return ZoneInfo(time_zone) if time_zone else timezone.utc
+        except (ZoneInfoNotFoundError, ValueError):
+            return timezone.utc
+
+    def _event_timestamp(self, moment: Dict[str, str], day_zone: tzinfo = timezone.utc) -> float:
+        if 'dateTime' in moment:
+            return _parse_datetime(moment['dateTime']).timestamp()
+        day = date.fromisoformat(moment['date'])
+        return datetime(day.year, day.month, day.day, tzinfo=day_zone).timestamp()
+
+    def _get_contact_details(self, contact_id: str) -> Dict[str, Any]:
+        cached = self._get_cached_contact(contact_id)
+        if cached is not None:
+            return cached
+        try:
+            person = self._execute_with_retry(self.people_service.people().get(
+                resourceName=f'people/{contact_id}',
+                personFields=self.CONTACT_FIELDS,
+                fields=self.PERSON_MASK
+            ))
+            
+            return self._cache_contact(self._contact_from_person(contact_id, person))
         except Exception as e:
-            return {"success": False, "error": f"Error getting contact details: {str(e)}"}
+            return self._error_result("Error getting contact details", e)
+
+    def _get_contacts_details_batch(self, contact_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        details = {}
+        missing = []
+        for contact_id in contact_ids:
+            cached = self._get_cached_contact(contact_id)
+            if cached is not None:
+                details[contact_id] = cached
+            elif contact_id not in missing:
+                missing.append(contact_id)
+
+        for i in range(0, len(missing), self.PEOPLE_BATCH_LIMIT):
+            chunk = missing[i:i + self.PEOPLE_BATCH_LIMIT]
+            response = self._execute_with_retry(self.people_service.people().getBatchGet(
+                resourceNames=[f'people/{contact_id}' for contact_id in chunk],
+                personFields=self.CONTACT_FIELDS,
+                fields=f'responses(requestedResourceName,status/message,person({self.PERSON_MASK}))'
+            ))
+
+            for item in response.get('responses', []):
+                contact_id = item.get('requestedResourceName', '').split('/')[-1]
+                person = item.get('person')
+                if person:
+                    details[contact_id] = self._cache_contact(self._contact_from_person(contact_id, person))
+                else:
+                    message = item.get('status', {}).get('message', 'not found')
+                    details[contact_id] = {"success": False, "error": f"Error getting contact details: {message}"}
+        return details
+
+    def _contact_from_person(self, contact_id: str, person: Dict[str, Any]) -> Dict[str, Any]:
+        names = person.get('names', [])
+        emails = person.get('emailAddresses', [])
+        phones = person.get('phoneNumbers', [])
+
+        return {
+            "success": True,
+            "contact_id": contact_id,
+            "name": names[0].get('displayName', '') if names else '',
+            "email": emails[0].get('value', '') if emails else '',
+            "phone": phones[0].get('value', '') if phones else ''
+        }
+
+    def _get_cached_contact(self, contact_id: str):
+        with self._contact_cache_lock:
+            contact = self._contact_cache.get(contact_id)
+            if contact is not None:
+                self._contact_cache.move_to_end(contact_id)
+            return contact
+
+    def _cache_contact(self, contact: Dict[str, Any]) -> Dict[str, Any]:
+        with self._contact_cache_lock:
+            self._contact_cache[contact["contact_id"]] = contact
+            self._contact_cache.move_to_end(contact["contact_id"])
+            if len(self._contact_cache) > self.CONTACT_CACHE_SIZE:
+                self._contact_cache.popitem(last=False)
+        return contact
     
-    def _execute_calendar_api(self, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        if action == "check_availability":
-            return self._check_availability(params["user_id"], params["start_time"], params["end_time"])
-        elif action == "get_free_slots":
-            return self._get_free_slots(params["user_id"], params["other_user_id"], params.get("date"))
-        elif action == "book_meeting":
-            return self._book_meeting(params["title"], params["attendees"], 
-                                    params["start_time"], params["end_time"], 
-                                    params.get("description", ""))
-        else:
-            return {"success": False, "error": f"Unknown calendar action: {action}"}
+    def _handle_check_availability(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._check_availability(params["user_id"], params["start_time"], params["end_time"])
+
+    def _handle_get_free_slots(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._get_free_slots(params["user_id"], params["other_user_id"], params.get("date"))
+
+    def _handle_book_meeting(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._book_meeting(params["title"], params["attendees"], 
+                                  params["start_time"], params["end_time"], 
+                                  params.get("description", ""))
+
+    def _handle_book_meetings(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            results = self._book_meetings_batch(params["meetings"])
+        except Exception as e:
+            return self._error_result("Error booking meetings", e)
+        return {"success": all(r["success"] for r in results), "meetings": results}
     
-    def _get_free_slots(self, user_id: str, other_user_id: str, date: str = None) -> Dict[str, Any]:
+    def _get_free_slots(self, user_id: str, other_user_id: str, date_str: str = None) -> Dict[str, Any]:
         try:
-            if date:
-                base_date =date.fromisoformat(date)
+            if date_str:
+                base_date = date.fromisoformat(date_str)
             else:
-                base_date = date.today() + datetime.timedelta(days=1)
+                base_date = date.today() + timedelta(days=1)
 
             start_hour = 9
             end_hour = 17
-            duration = timedelta(minutes=30)
+            duration = 30
+            step = 30
             
             contact_details = self._get_contact_details(other_user_id)
             if not contact_details.get("success", False):
@@ -151,19 +550,22 @@ class GoogleCalendarAPIExecutor:
             if not contact_email:
                 return {"success": False, "error": "Contact does not have an email address"}
             
-            time_min = datetime.combine(base_date, datetime.time(start_hour, 0))
-            time_max = datetime.combine(base_date, datetime.time(end_hour, 0))
+            time_min = datetime(base_date.year, base_date.month, base_date.day, start_hour, tzinfo=timezone.utc)
+            time_max = datetime(base_date.year, base_date.month, base_date.day, end_hour, tzinfo=timezone.utc)
             
             body = {
-                "timeMin": time_min.isoformat() + "Z",
-                "timeMax": time_max.isoformat() + "Z",
+                "timeMin": time_min.isoformat(),
+                "timeMax": time_max.isoformat(),
                 "items": [
                     {"id": "primary"},
                     {"id": contact_email}
                 ]
             }
             
-            freebusy = self.calendar_service.freebusy().query(body=body).execute()
+            freebusy = self._execute_with_retry(self.calendar_service.freebusy().query(
+                body=body,
+                fields='calendars'
+            ))
             
             calendars = freebusy.get('calendars', {})
             primary_busy = calendars.get('primary', {}).get('busy', [])
@@ -171,31 +573,48 @@ class GoogleCalendarAPIExecutor:
             
             all_busy = primary_busy + other_busy
             
+            # Busy periods become whole-minute offsets from the start of the working day,
+            # rounded outwards so integer comparisons give the same answer as datetimes
             busy_periods = []
             for period in all_busy:
-                start = datetime.fromisoformat(period['start'].replace('Z', '+00:00'))
-                end = datetime.fromisoformat(period['end'].replace('Z', '+00:00'))
-                busy_periods.append((start, end))
+                start = (_parse_datetime(period['start']) - time_min).total_seconds()
+                end = (_parse_datetime(period['end']) - time_min).total_seconds()
+                busy_periods.append((int(start // 60), -int(-end // 60)))
+            
+            # Merge overlapping busy periods so the day can be swept once in order
+            busy_periods.sort()
+            merged = []
+            for start, end in busy_periods:
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            
+            day_minutes = (end_hour - start_hour) * 60
+            day = base_date.isoformat()
+            stamps = [f"{day}T{start_hour + m // 60:02d}:{m % 60:02d}:00Z"
+                      for m in range(0, day_minutes + 1, step)]
             
             free_slots = []
-            current_time = time_min
+            current = 0
             
-            while current_time + duration <= time_max:
-                slot_end = current_time + duration
-                is_free = True
-                
-                for busy_start, busy_end in busy_periods:
-                    if not (slot_end <= busy_start or current_time >= busy_end):
-                        is_free = False
-                        break
-                
-                if is_free:
+            for busy_start, busy_end in merged:
+                while current + duration <= min(busy_start, day_minutes):
                     free_slots.append({
-                        "start_time": current_time.isoformat() + "Z",
-                        "end_time": slot_end.isoformat() + "Z"
+                        "start_time": stamps[current // step],
+                        "end_time": stamps[(current + duration) // step]
                     })
-                
-                current_time += datetime.timedelta(minutes=30)
+                    current += step
+                if busy_end > current:
+                    # Resume on the first slot boundary at or after the end of the busy period
+                    current = -(-busy_end // step) * step
+            
+            while current + duration <= day_minutes:
+                free_slots.append({
+                    "start_time": stamps[current // step],
+                    "end_time": stamps[(current + duration) // step]
+                })
+                current += step
             
             return {
                 "success": True,
@@ -203,13 +622,10 @@ class GoogleCalendarAPIExecutor:
                 "slots": free_slots
             }
         except Exception as e:
-            return {"success": False, "error": f"Error getting free slots: {str(e)}"}
+            return self._error_result("Error getting free slots", e)
 
-    def _execute_preferences_api(self, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        if action == "get_meeting_preferences":
-            return self._get_meeting_preferences(params["user_id"], params.get("ask_user", False))
-        else:
-            return {"success": False, "error": f"Unknown preferences action: {action}"}
+    def _handle_get_meeting_preferences(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._get_meeting_preferences(params["user_id"], params.get("ask_user", False))
 
     def _get_meeting_preferences(self, user_id: str, ask_user: bool = False) -> Dict[str, Any]:
         if ask_user:
@@ -233,135 +649,155 @@ class GoogleCalendarAPIExecutor:
     
     def _check_availability(self, user_id: str, start_time: str, end_time: str) -> Dict[str, Any]:
         try:
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            start_dt = _parse_datetime(start_time)
+            end_dt = _parse_datetime(end_time)
             
-            events_result = self.calendar_service.events().list(
-                calendarId='primary',
-                timeMin=start_dt.isoformat() + 'Z',
-                timeMax=end_dt.isoformat() + 'Z',
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            conflicts = self._local_cache_query(start_dt, end_dt)
+            if conflicts is not None:
+                return {
+                    "success": True,
+                    "is_available": conflicts == 0,
+                    "conflicting_events": conflicts
+                }
+            
+            body = {
+                "timeMin": start_dt.isoformat() if start_dt.tzinfo else start_dt.isoformat() + 'Z',
+                "timeMax": end_dt.isoformat() if end_dt.tzinfo else end_dt.isoformat() + 'Z',
+                "items": [{"id": "primary"}]
+            }
+            
+            # FreeBusy only returns busy intervals, which is all we need to decide availability
+            freebusy = self._execute_with_retry(self.calendar_service.freebusy().query(
+                body=body,
+                fields='calendars'
+            ))
             
-            events = events_result.get('items', [])
+            busy = freebusy.get('calendars', {}).get('primary', {}).get('busy', [])
             
-            is_available = len(events) == 0
+            is_available = not busy
             
+            # FreeBusy merges overlapping events, so conflicting_events counts busy periods on both paths
             return {
                 "success": True,
                 "is_available": is_available,
-                "conflicting_events": len(events)
+                "conflicting_events": len(busy)
             }
         except Exception as e:
-            return {"success": False, "error": f"Error checking availability: {str(e)}"}
+            return self._error_result("Error checking availability", e)
     
+    def _local_cache_query(self, start_dt: datetime, end_dt: datetime):
+        if self._store is None:
+            return None
+        if start_dt.tzinfo is None:
+            start_dt = start_dt.replace(tzinfo=timezone.utc)
+        if end_dt.tzinfo is None:
+            end_dt = end_dt.replace(tzinfo=timezone.utc)
+        if start_dt < datetime.now(timezone.utc) - self.EVENTS_SYNC_LOOKBACK:
+            # Older events were never synced, so an empty count there would be a false "free"
+            return None
+        try:
+            self._sync_events_if_due()
+        except Exception:
+            # A stale local copy only costs speed; the query falls back to the API
+            logger.warning("Calendar sync failed", exc_info=True)
+            return None
+        
+        return self._store.count_busy_periods('primary', start_dt.timestamp(), end_dt.timestamp())
+
     def _book_meeting(self, title: str, attendees: List[str], start_time: str, 
                      end_time: str, description: str = "") -> Dict[str, Any]:
         try:
-            attendee_emails = []
-            for attendee_id in attendees:
-                if '@' in attendee_id:
-                    attendee_emails.append({"email": attendee_id})
-                else:
-                    contact = self._get_contact_details(attendee_id)
-                    if contact.get("success", False) and contact.get("email"):
-                        attendee_emails.append({"email": contact["email"]})
-            
-            event = {
-                'summary': title,
-                'description': description,
-                'start': {
-                    'dateTime': start_time,
-                    'timeZone': 'UTC',
-                },
-                'end': {
-                    'dateTime': end_time,
-                    'timeZone': 'UTC',
-                },
-                'attendees': attendee_emails,
-                'reminders': {
-                    'useDefault': True,
-                },
-            }
+            contact_ids = [a for a in attendees if '@' not in a]
+            contacts = self._get_contacts_details_batch(contact_ids) if contact_ids else {}
+            attendee_emails = self._resolve_attendees(attendees, contacts)
             
             event = self.calendar_service.events().insert(
                 calendarId='primary',
-                body=event,
+                body=self._build_event(title, attendee_emails, start_time, end_time, description),
                 sendUpdates='all'
             ).execute()
+            self._events_stale = True
             
-            return {
-                "success": True,
-                "meeting_id": event.get('id'),
-                "title": title,
-                "start_time": start_time,
-                "end_time": end_time,
-                "attendees": [a.get("email") for a in attendee_emails],
-                "link": event.get('htmlLink')
-            }
+            return self._booking_result(event, title, attendee_emails, start_time, end_time)
         except Exception as e:
-            return {"success": False, "error": f"Error booking meeting: {str(e)}"}
+            return self._error_result("Error booking meeting", e)
 
-class MeetingBookingMCPAgent:
-    def __init__(self, api_executor, openai_api_key: str):
-        self.api_executor = api_executor
-        openai.api_key = openai_api_key
-
-    def process_user_prompt(self, prompt: str, user_id: str) -> Dict[str, Any]:
-        intent = self._parse_intent_with_llm(prompt)
+    def _book_meetings_batch(self, meetings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        contact_ids = [a for m in meetings for a in m["attendees"] if '@' not in a]
+        contacts = self._get_contacts_details_batch(contact_ids) if contact_ids else {}
         
-        if intent['action'] == 'book_meeting':
-            plan = self._create_execution_plan(intent, user_id)
-            print("here")
-            results = self._execute_plan(plan)
-            print("here")
-            return self._generate_response(prompt, results)
-        else:
-            return {"message": "I'm not sure what you want to do. Can you clarify?", "status": "error"}
-
-    def _parse_intent_with_llm(self, prompt: str) -> Dict[str, Any]:
-        response = openai.Completion.create(
-            engine="text-davinci-003",
-            prompt=f"Analyze this prompt: {prompt}. Extract intent and details.",
-            max_tokens=150
-        )
-        return {"action": "book_meeting", "contact_name": "Chinmay Sir", "ask_preferences": False}
-
-    def _create_execution_plan(self, intent: Dict[str, Any], user_id: str) -> List[Dict[str, Any]]:
-        plan = []
-        if 'contact_name' in intent:
-            plan.append({
-                "api": "contacts",
-                "action": "find_contact",
-                "params": {"name": intent['contact_name']}
-            })
-        if 'ask_preferences' in intent and intent['ask_preferences']:
-            plan.append({
-                "api": "preferences",
-                "action": "get_meeting_preferences",
-                "params": {"user_id": user_id, "ask_user": True}
-            })
-        plan.append({
-            "api": "calendar",
-            "action": "get_free_slots",
-            "params": {"user_id": user_id, "other_user_id": "PLACEHOLDER", "date": "PLACEHOLDER"}
-        })
-        # Additional steps based on the intent...
-        return plan
-
-    def _execute_plan(self, plan: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results = {}
-        for step in plan:
-            result = self.api_executor.execute(step['api'], step['action'], step['params'])
-            results[f"{step['api']}_{step['action']}"] = result
-        return results
-
-    def _generate_response(self, prompt: str, results: Dict[str, Any]) -> Dict[str, Any]:
-        if "contacts_find_contact" in results and results["contacts_find_contact"].get("success"):
-            return {"message": "Contact found and processed.", "status": "success"}
-        else:
-            return {"message": "Failed to find contact.", "status": "error"}
+        results = [None] * len(meetings)
+        attendee_lists = [self._resolve_attendees(m["attendees"], contacts) for m in meetings]
+
+        def on_inserted(request_id, event, exception):
+            i = int(request_id)
+            if exception is not None:
+                results[i] = self._error_result("Error booking meeting", exception)
+            else:
+                m = meetings[i]
+                results[i] = self._booking_result(event, m["title"], attendee_lists[i],
+                                                  m["start_time"], m["end_time"])
+
+        error = {"success": False, "error": "Error booking meeting: no response from the batch request"}
+        try:
+            # One multipart request per CALENDAR_BATCH_LIMIT inserts instead of one round-trip each
+            for offset in range(0, len(meetings), self.CALENDAR_BATCH_LIMIT):
+                batch = self.calendar_service.new_batch_http_request(callback=on_inserted)
+                for i in range(offset, min(offset + self.CALENDAR_BATCH_LIMIT, len(meetings))):
+                    m = meetings[i]
+                    batch.add(self.calendar_service.events().insert(
+                        calendarId='primary',
+                        body=self._build_event(m["title"], attendee_lists[i], m["start_time"],
+                                               m["end_time"], m.get("description", "")),
+                        sendUpdates='all'
+                    ), request_id=str(i))
+                batch.execute()
+        except Exception as e:
+            # Later chunks are not sent; meetings without a callback may or may not exist
+            error = self._error_result("Booking not confirmed", e)
+        finally:
+            # Earlier chunks may already have created events, even if a later one failed
+            self._events_stale = True
+        return [r if r is not None else dict(error) for r in results]
+
+    def _resolve_attendees(self, attendees: List[str], contacts: Dict[str, Dict[str, Any]]) -> List[str]:
+        # Failed lookups carry no "email" key, so they drop out with contacts lacking an address
+        emails = (a if '@' in a else contacts.get(a, {}).get("email") for a in attendees)
+        return [email for email in emails if email]
+
+    def _build_event(self, title: str, attendee_emails: List[str], start_time: str,
+                     end_time: str, description: str = "") -> Dict[str, Any]:
+        return {
+            'summary': title,
+            'description': description,
+            'start': {
+                'dateTime': start_time,
+                'timeZone': 'UTC',
+            },
+            'end': {
+                'dateTime': end_time,
+                'timeZone': 'UTC',
+            },
+            'attendees': [{"email": email} for email in attendee_emails],
+            'reminders': {
+                'useDefault': True,
+            },
+        }
+
+    def _booking_result(self, event: Dict[str, Any], title: str, attendee_emails: List[str],
+                        start_time: str, end_time: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "meeting_id": event.get('id'),
+            "title": title,
+            "start_time": start_time,
+            "end_time": end_time,
+            "attendees": attendee_emails,
+            "link": event.get('htmlLink')
+        }
+
+# The agent lives in meeting_booking_agent; re-exported so existing imports from here keep working
+from meeting_booking_agent import MeetingBookingMCPAgent
 
 # Example usage
 def example_google_calendar_integration():
@@ -377,4 +813,6 @@ def example_google_calendar_integration():
     print(result)
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     example_google_calendar_integration()
@@ -1,90 +1,662 @@
 import json
-from typing import List, Dict, Any
-from datetime import datetime, date
-from google_calendar_integration_openai import  GoogleCalendarAPIExecutor
-import openai
-from dotenv import load_dotenv
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+import string
+import asyncio
+import logging
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, NamedTuple
+from datetime import datetime, date, time as dt_time, timedelta
 import os
 
-from typing import Dict, Any
-load_dotenv()
+try:
+    import orjson
+
+    json_loads = orjson.loads
+
+    def json_dumps(obj: Any, sort_keys: bool = False, default=None) -> str:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=option).decode()
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj: Any, sort_keys: bool = False, default=None) -> str:
+        return json.dumps(obj, sort_keys=sort_keys, default=default, separators=(",", ":"))
+
+logger = logging.getLogger("meeting_agent")
+# Identifies the prompt being served; copied into tasks and worker threads with the context
+_TRACE_ID = contextvars.ContextVar("trace_id", default=None)
+
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "trace_id"):
+            record.trace_id = _TRACE_ID.get()
+        return True
+
+
+logger.addFilter(_TraceIdFilter())
+
+INTENT_CACHE_PATH = os.path.expanduser("~/.cache/meeting_agent/intents.db")
+INTENT_CACHE_TTL = 86400
+# Consecutive backend failures that open the breaker, and how long it then stays open (s)
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+# Raised by an executor when the backend cannot be reached; tagged results carry "backend_error"
+_TRANSPORT_ERRORS = (TimeoutError, ConnectionError)
+# Set per prompt; read by CachingExecutor in whatever task or thread serves the call
+_BYPASS_CACHE = contextvars.ContextVar("bypass_cache", default=False)
+# Sent byte-for-byte identical as message[0] on every call. It is kept past 1024 tokens so the
+# API's automatic prompt caching reuses the prefix and only the user message is prefilled.
+# Do not interpolate anything per request into it.
+INTENT_SYSTEM_PROMPT = """You are the intent classifier of a meeting booking assistant that works against the user's Google Calendar and Google Contacts.
+
+You receive one message written by the user. Reply with a single JSON object and nothing else. The object has exactly two keys.
+
+"intent" is an object with these keys:
+- "action": one of "book_meeting", "cancel_meeting", "reschedule_meeting", "list_meetings" or "unknown".
+  - "book_meeting": the user wants a new meeting, call or catch-up with someone, or asks when they can meet someone.
+  - "cancel_meeting": the user wants an existing meeting removed or called off.
+  - "reschedule_meeting": the user wants an existing meeting moved to another day or time.
+  - "list_meetings": the user wants to see what is on their calendar.
+  - "unknown": anything else, including greetings, small talk, questions unrelated to meetings and requests you cannot map to one of the actions above.
+- "contact_name": the name of the person the meeting is with, exactly as the user wrote it, including titles or honorifics such as "Sir", "Ma'am", "Dr." or "Prof.". Use null when no person is named. Never invent, shorten, translate or correct a name.
+- "ask_preferences": true only when the user explicitly asks to use, check or be asked about their meeting preferences (duration, preferred time of day, buffers); otherwise false.
+
+"response_template" is the one-sentence reply shown to the user once free slots have been found for a booking. It may use only these placeholders, written with single curly braces:
+- {contact_name}: the contact's display name as stored in Google Contacts.
+- {slot_count}: how many free slots were found.
+- {first_slot}: the start time of the earliest free slot.
+Do not use any other placeholder or literal curly braces. Keep it friendly, under 25 words, and end by asking whether to book the first slot or see the others. For actions other than "book_meeting", still write a short, polite sentence; it will not be shown.
+
+Rules:
+1. Classify by what the user wants done, not by the words used; "set something up with", "find time with" and "get 30 minutes with" all mean "book_meeting".
+2. If a message contains several requests, classify the first one.
+3. Dates, times and durations in the message are handled elsewhere; do not put them in "contact_name".
+4. If the user only names a group or a team rather than a person, use that text as "contact_name".
+5. When unsure between an action and "unknown", choose "unknown"; the user will be asked to clarify.
+
+Examples:
+
+User: Book a meeting with Chinmay Sir
+{"intent": {"action": "book_meeting", "contact_name": "Chinmay Sir", "ask_preferences": false}, "response_template": "I found {slot_count} free slots with {contact_name}; the earliest is {first_slot}. Shall I book it?"}
+
+User: can you find some time with priya tomorrow afternoon?
+{"intent": {"action": "book_meeting", "contact_name": "priya", "ask_preferences": false}, "response_template": "{contact_name} and you have {slot_count} open slots, starting at {first_slot}. Want me to book that one?"}
+
+User: Set up a call with Dr. Mehta using my usual meeting preferences
+{"intent": {"action": "book_meeting", "contact_name": "Dr. Mehta", "ask_preferences": true}, "response_template": "Using your preferences, there are {slot_count} slots with {contact_name}; first up is {first_slot}. Book it?"}
+
+User: I need to catch up with the design team next week
+{"intent": {"action": "book_meeting", "contact_name": "the design team", "ask_preferences": false}, "response_template": "There are {slot_count} times that work for {contact_name}, the earliest at {first_slot}. Should I book it or show the rest?"}
+
+User: When are Rahul and I both free on Friday?
+{"intent": {"action": "book_meeting", "contact_name": "Rahul", "ask_preferences": false}, "response_template": "You and {contact_name} share {slot_count} free slots; the first is {first_slot}. Shall I book it?"}
+
+User: Please cancel my 3pm with Anita
+{"intent": {"action": "cancel_meeting", "contact_name": "Anita", "ask_preferences": false}, "response_template": "Okay, I will cancel that meeting."}
+
+User: Can we push the project sync to Thursday?
+{"intent": {"action": "reschedule_meeting", "contact_name": null, "ask_preferences": false}, "response_template": "Sure, let me find a new time for that meeting."}
+
+User: Move my meeting with Prof. Iyer to next Monday morning
+{"intent": {"action": "reschedule_meeting", "contact_name": "Prof. Iyer", "ask_preferences": false}, "response_template": "Sure, I will look for a new time with {contact_name}."}
+
+User: what does my day look like tomorrow
+{"intent": {"action": "list_meetings", "contact_name": null, "ask_preferences": false}, "response_template": "Here is what is on your calendar."}
+
+User: Show me all my meetings this week
+{"intent": {"action": "list_meetings", "contact_name": null, "ask_preferences": false}, "response_template": "Here are your meetings for the week."}
+
+User: hi, how are you?
+{"intent": {"action": "unknown", "contact_name": null, "ask_preferences": false}, "response_template": "Hello! Tell me who you would like to meet and I will find a time."}
+
+User: What's the weather in Bangalore?
+{"intent": {"action": "unknown", "contact_name": null, "ask_preferences": false}, "response_template": "I can only help with meetings; who would you like to meet?"}
+"""
+# Intent and user-facing wording come back from a single structured-output call
+INTENT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "meeting_intent",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "intent": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "type": "string",
+                            "enum": ["book_meeting", "cancel_meeting", "reschedule_meeting",
+                                     "list_meetings", "unknown"]
+                        },
+                        "contact_name": {"type": ["string", "null"]},
+                        "ask_preferences": {"type": "boolean"}
+                    },
+                    "required": ["action", "contact_name", "ask_preferences"],
+                    "additionalProperties": False
+                },
+                "response_template": {"type": "string"}
+            },
+            "required": ["intent", "response_template"],
+            "additionalProperties": False
+        }
+    }
+}
+DEFAULT_SLOTS_MESSAGE = "Meeting slots found and processed."
+_TEMPLATE_FIELD_RE = re.compile(r"\{(\w+)\}")
+# Enough for the schema's JSON (intent plus a one-sentence template) with headroom
+INTENT_MAX_TOKENS = 120
+
+# Unambiguous phrasings are matched locally so they never cost an LLM round-trip
+_TRAILING_TIME = r"(?:\s+(?:today|tomorrow|(?:on|at|next|this)\s+.+))?\s*[.!?]*"
+# A contact is one or more capitalised tokens (case-sensitive even under re.I), never a time word;
+# anything looser ("the team at Acme", "Priya next") is left to the LLM
+_NAME_TOKEN = r"(?!(?:today|tomorrow|on|at|next|this)\b)(?-i:[A-Z][\w'-]*(?:\.(?=\s))?)"
+_CONTACT = rf"{_NAME_TOKEN}(?:\s+{_NAME_TOKEN})*"
+# Each intent's contact, if any, is captured as "<action>_contact"
+_INTENT_PATTERNS = [
+    ("book_meeting",
+     r"(?:please\s+)?(?:book|schedule|set up|arrange)\s+(?:a\s+|an\s+)?(?:meeting|call)\s+with\s+"
+     r"(?P<book_meeting_contact>" + _CONTACT + r")" + _TRAILING_TIME),
+    ("cancel_meeting",
+     r"(?:please\s+)?cancel\s+(?:the\s+|my\s+)?(?:meeting|call)"
+     r"(?:\s+with\s+(?P<cancel_meeting_contact>" + _CONTACT + r"))?" + _TRAILING_TIME),
+    ("reschedule_meeting",
+     r"(?:please\s+)?(?:reschedule|move)\s+(?:the\s+|my\s+)?(?:meeting|call)"
+     r"(?:\s+with\s+(?P<reschedule_meeting_contact>" + _CONTACT + r"))?" + _TRAILING_TIME),
+    ("list_meetings",
+     r"(?:list|show)\s+(?:all\s+)?(?:my\s+)?(?:meetings|calendar|events)" + _TRAILING_TIME),
+]
+# One alternation, one pass: the outer group that matched (m.lastgroup) names the intent
+_INTENT_RE = re.compile("|".join(f"(?P<{action}>{pattern})" for action, pattern in _INTENT_PATTERNS), re.I)
+# Loose capitalised-name match used only to start speculative contact lookups
+_CONTACT_CANDIDATE_RE = re.compile(r"\bwith\s+(?P<contact>[A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)")
+# (ISO date string, epoch second it stops being today)
+_TODAY = ["", 0.0]
+_PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+
+def _regex_intent(prompt: str) -> Optional[Dict[str, Any]]:
+    match = _INTENT_RE.fullmatch(prompt.strip())
+    if match is None:
+        return None
+    action = match.lastgroup
+    intent = {"action": action}
+    contact = match.groupdict().get(f"{action}_contact")
+    if contact:
+        intent["contact_name"] = contact.strip()
+    if action == "book_meeting":
+        intent["ask_preferences"] = False
+    return intent
+
+
+def _today_iso() -> str:
+    # Formatted once per local day; refreshed only after the next local midnight passes
+    now = time.time()
+    if now >= _TODAY[1]:
+        today = date.today()
+        next_midnight = datetime.combine(today + timedelta(days=1), dt_time.min).timestamp()
+        _TODAY[:] = [today.isoformat(), next_midnight]
+    return _TODAY[0]
+
+
+def _is_json_object(content: str) -> bool:
+    try:
+        return isinstance(json_loads(content), dict)
+    except ValueError:
+        return False
+
+
+def _intent_cache_key(prompt: str) -> str:
+    # Case, punctuation and spacing do not change the intent, so they do not split the cache
+    normalized = " ".join(prompt.lower().translate(_PUNCTUATION_TABLE).split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _speculation_key(api: str, action: str, params: Dict[str, Any]) -> tuple:
+    # Serialised like CachingExecutor keys, so list-valued params (e.g. attendees) stay hashable
+    return api, action, json_dumps(params, sort_keys=True)
+
+
+class StepID(IntEnum):
+    FIND_CONTACT = 0
+    GET_PREFS = 1
+    GET_SLOTS = 2
+
+
+class StepRef(NamedTuple):
+    # A plan param filled from a field of an upstream step's result
+    step: StepID
+    field: str
+
+
+@lru_cache(maxsize=32)
+def _plan_skeleton(has_contact: bool, ask_prefs: bool) -> tuple:
+    # Plan shape depends only on these flags; None params are filled per request by name
+    plan = []
+    if has_contact:
+        plan.append({
+            "id": StepID.FIND_CONTACT,
+            "api": "contacts",
+            "action": "find_contact",
+            "params": {"name": None},
+            "depends_on": []
+        })
+    if ask_prefs:
+        plan.append({
+            "id": StepID.GET_PREFS,
+            "api": "preferences",
+            "action": "get_meeting_preferences",
+            "params": {"user_id": None, "ask_user": True},
+            "depends_on": []
+        })
+    plan.append({
+        "id": StepID.GET_SLOTS,
+        "api": "calendar",
+        "action": "get_free_slots",
+        "params": {"user_id": None, "other_user_id": StepRef(StepID.FIND_CONTACT, "contact_id"), "date": None},
+        "depends_on": [StepID.FIND_CONTACT]
+    })
+    return tuple(plan)
+
+
+class _Speculation(dict):
+    # Speculative tasks keyed by _speculation_key; closed once the prompt that started them returns
+    closed = False
+
+
+class CachingExecutor:
+    # Read actions worth caching and their TTL in seconds; anything else passes straight through
+    TTLS = {
+        ("calendar", "get_free_slots"): 60,
+        ("contacts", "find_contact"): 300,
+    }
+    WRITE_ACTIONS = frozenset({("calendar", "book_meeting"), ("calendar", "book_meetings")})
+    MAX_ENTRIES = 1024
+
+    def __init__(self, executor):
+        self._executor = executor
+        # Least recently used first; the sync facade and speculation call in from worker threads
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def execute(self, api_name: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        key, hit = self._lookup(api_name, action, params)
+        if hit is not None:
+            return hit
+        result = self._executor.execute(api_name, action, params)
+        self._remember(key, api_name, action, result)
+        return result
+
+    async def execute_async(self, api_name: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        key, hit = self._lookup(api_name, action, params)
+        if hit is not None:
+            return hit
+        execute_async = getattr(self._executor, 'execute_async', None)
+        if execute_async is not None:
+            result = await execute_async(api_name, action, params)
+        else:
+            result = await asyncio.to_thread(self._executor.execute, api_name, action, params)
+        self._remember(key, api_name, action, result)
+        return result
+
+    async def warm_cache(self):
+        warm_cache = getattr(self._executor, 'warm_cache', None)
+        if warm_cache is not None:
+            await asyncio.to_thread(warm_cache)
+
+    def _lookup(self, api_name: str, action: str, params: Dict[str, Any]):
+        if (api_name, action) not in self.TTLS:
+            return None, None
+        key = (api_name, action, json_dumps(params, sort_keys=True))
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+        if entry is not None and not _BYPASS_CACHE.get() and entry[0] > time.monotonic():
+            logger.info("%s.%s served from cache", api_name, action, extra={"cache_hit": True})
+            # Flagged so the circuit breaker can tell a cached answer from a live backend response
+            return key, dict(entry[1], cached=True)
+        return key, None
+
+    def _remember(self, key, api_name: str, action: str, result: Dict[str, Any]):
+        with self._lock:
+            if (api_name, action) in self.WRITE_ACTIONS and result.get("success"):
+                # A booking changes availability, so cached free slots are no longer trustworthy
+                for k in [k for k in self._cache if k[1] == "get_free_slots"]:
+                    del self._cache[k]
+            if key is None or not result.get("success"):
+                return
+            self._cache[key] = (time.monotonic() + self.TTLS[(api_name, action)], result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.MAX_ENTRIES:
+                self._cache.popitem(last=False)
+
+
+class IntentCache:
+    """LLM-classified intents persisted in SQLite, so repeat prompts skip the LLM across restarts."""
+
+    def __init__(self, path: str, ttl: float = INTENT_CACHE_TTL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._ttl = ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS intents "
+                "(key TEXT PRIMARY KEY, intent TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT intent FROM intents WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return json_loads(row[0]) if row else None
+
+    def set(self, key: str, intent: Dict[str, Any]):
+        now = time.time()
+        with self._lock, self._conn:
+            # Expired rows are never read again; dropping them here keeps the file from growing forever
+            self._conn.execute("DELETE FROM intents WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO intents (key, intent, expires_at) VALUES (?, ?, ?)",
+                (key, json_dumps(intent), now + self._ttl))
 
 
 class MeetingBookingMCPAgent:
-    def __init__(self, api_executor, openai_api_key: str):
-        self.api_executor = api_executor
-        openai.api_key = openai_api_key
+    def __init__(self, api_executor, openai_api_key: str, intent_cache_path: Optional[str] = INTENT_CACHE_PATH):
+        self.api_executor = CachingExecutor(api_executor)
+        self._intent_cache = IntentCache(intent_cache_path) if intent_cache_path else None
+        # One client per agent so its HTTP connection pool is reused across prompts; created on
+        # first LLM call, so prompts answered locally never pay for importing openai
+        self._openai_api_key = openai_api_key
+        self._openai = None
         self.pending_action = None
+        # Consecutive backend failures per API, so a healthy Contacts cannot mask a Calendar outage
+        self._breaker = {"fail_counts": {}, "open_until": 0.0}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        # Speculative calls get their own workers: a prompt that finishes first never waits for them,
+        # and neither does asyncio.run when it shuts down the default executor
+        self._speculation_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="meeting-agent-speculation")
 
-    def process_user_prompt(self, prompt: str, user_id: str) -> Dict[str, Any]:
-      
-        intent = self._parse_intent_with_llm(prompt)
-        
-        if intent['action'] == 'book_meeting':
-            plan = self._create_execution_plan(intent, user_id)
-            results = self._execute_plan(plan)
-            return self._generate_response(prompt, results)
-        else:
-            return {"message": "I'm not sure what you want to do. Can you clarify?", "status": "error"}
+    def process_user_prompt(self, prompt: str, user_id: str, bypass_cache: bool = False) -> Dict[str, Any]:
+        future = asyncio.run_coroutine_threadsafe(
+            self.process_user_prompt_async(prompt, user_id, bypass_cache), self._sync_loop())
+        return future.result()
+
+    def _sync_loop(self) -> asyncio.AbstractEventLoop:
+        # asyncio.run would tear down its worker threads after every prompt, and with them the
+        # per-thread HTTP connection pools; the sync facade keeps one loop and pool alive instead
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(ThreadPoolExecutor(thread_name_prefix="meeting-agent"))
+                threading.Thread(target=loop.run_forever, name="meeting-agent-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def warm_cache(self):
+        # Best effort: refreshes the executor's contacts index and primary-calendar events,
+        # meant to run in the background while the user is typing
+        try:
+            await self.api_executor.warm_cache()
+        except Exception:
+            logger.warning("cache warm-up failed", exc_info=True)
+
+    async def process_user_prompt_async(self, prompt: str, user_id: str,
+                                        bypass_cache: bool = False,
+                                        trace_id: Optional[str] = None) -> Dict[str, Any]:
+        _TRACE_ID.set(trace_id)
+        if time.monotonic() < self._breaker["open_until"]:
+            # The calendar backend keeps failing; skip the LLM and the plan until the cool-off ends
+            return {"message": "Calendar service unavailable, retry shortly", "status": "error"}
+        _BYPASS_CACHE.set(bypass_cache)
+        speculative = _Speculation()
+        try:
+            started = time.perf_counter()
+            intent = _regex_intent(prompt)
+            if intent is None:
+                intent = await asyncio.to_thread(self._cached_intent, prompt)
+            if intent is None:
+                # The LLM will be consulted; overlap its latency with the likely contact lookup
+                candidate = _CONTACT_CANDIDATE_RE.search(prompt)
+                if candidate:
+                    self._speculate(speculative, user_id, "contacts", "find_contact",
+                                    {"name": candidate['contact']})
+                intent = await asyncio.to_thread(self._classify_and_cache, prompt)
+            self._log_stage("intent", started)
+            
+            if intent['action'] == 'book_meeting':
+                plan = self._create_execution_plan(intent, user_id)
+                started = time.perf_counter()
+                results = await self._execute_plan(plan, speculative)
+                self._log_stage("plan", started)
+                return self._generate_response(prompt, results, intent.get('response_template'))
+            else:
+                return {"message": "I'm not sure what you want to do. Can you clarify?", "status": "error"}
+        finally:
+            # Discard speculation the plan did not use, and stop callbacks from starting more
+            speculative.closed = True
+            for task in list(speculative.values()):
+                task.cancel()
+
+    def _log_stage(self, stage: str, started: float):
+        logger.info("%s done", stage,
+                    extra={"stage": stage, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    def _speculate(self, speculative: _Speculation, user_id: str, api: str,
+                   action: str, params: Dict[str, Any]):
+        if speculative.closed:
+            return
+        task = asyncio.create_task(self._call_speculatively(api, action, params))
+        speculative[_speculation_key(api, action, params)] = task
+        if action == "find_contact":
+            # Once the contact resolves, the free-slot query the plan will make is also predictable
+            def on_found(done: asyncio.Task):
+                if (speculative.closed or done.cancelled() or done.exception() is not None
+                        or not done.result().get("success")):
+                    return
+                self._speculate(speculative, user_id, "calendar", "get_free_slots", {
+                    "user_id": user_id,
+                    "other_user_id": done.result()["contact_id"],
+                    "date": _today_iso()
+                })
+            task.add_done_callback(on_found)
+
+    async def _call_speculatively(self, api: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Same context as asyncio.to_thread would pass, so trace ids and bypass_cache still apply
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._speculation_pool, context.run, self.api_executor.execute, api, action, params)
+
+    def _cached_intent(self, prompt: str) -> Optional[Dict[str, Any]]:
+        if self._intent_cache is None or _BYPASS_CACHE.get():
+            return None
+        intent = self._intent_cache.get(_intent_cache_key(prompt))
+        if intent is not None:
+            logger.info("intent served from disk cache", extra={"cache_hit": True})
+        return intent
+
+    def _classify_and_cache(self, prompt: str) -> Dict[str, Any]:
+        intent = self._classify_with_llm(prompt)
+        if self._intent_cache is not None and intent["action"] != "unknown":
+            self._intent_cache.set(_intent_cache_key(prompt), intent)
+        return intent
 
-    def _parse_intent_with_llm(self, prompt: str) -> Dict[str, Any]:
-        # Using the new ChatCompletion API call
-        client= openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+    def _classify_with_llm(self, prompt: str) -> Dict[str, Any]:
+        message_content = self._request_intent(prompt)
+        if message_content is None:
+            return {"action": "unknown"}
+        payload = json_loads(message_content)
+        intent = payload.get("intent") if isinstance(payload, dict) else None
+        if not isinstance(intent, dict):
+            return {"action": "unknown"}
+        intent.setdefault("action", "unknown")
+        if intent.get("contact_name") is None:
+            intent.pop("contact_name", None)
+        if isinstance(payload.get("response_template"), str):
+            intent["response_template"] = payload["response_template"]
+        return intent
+
+    def _request_intent(self, prompt: str) -> Optional[str]:
+        # Streamed so the connection is dropped as soon as the JSON object is complete. Returns
+        # None unless the reply is a complete JSON object: under the strict schema a parsed
+        # top-level object is a finished reply, and anything else must have finished with "stop".
+        if self._openai is None:
+            import openai
+            self._openai = openai.OpenAI(api_key=self._openai_api_key, timeout=10.0, max_retries=2)
+        stream = self._openai.chat.completions.create(
+            model="gpt-4o-mini",
+            response_format=INTENT_RESPONSE_FORMAT,
+            temperature=0,
+            max_tokens=INTENT_MAX_TOKENS,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": f"Analyze this prompt: {prompt}. Extract intent and details."}
-            ]
+                {"role": "system", "content": INTENT_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True
         )
-        message_content = response.choices[0].message.content
-        # Here, you need to parse `message_content` into a Python dictionary
-        # This is an example assuming the response contains JSON-like structure
-        return {"action": "book_meeting", "contact_name": "Chinmay Sir", "ask_preferences": False}
+        buffer = []
+        finish_reason = None
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                if not choice.delta.content:
+                    continue
+                buffer.append(choice.delta.content)
+                if not buffer[-1].rstrip().endswith("}"):
+                    continue
+                content = "".join(buffer)
+                if _is_json_object(content):
+                    return content
+        finally:
+            stream.close()
+        content = "".join(buffer)
+        if finish_reason == "stop" and _is_json_object(content):
+            return content
+        logger.warning("intent reply incomplete (finish_reason=%s); not cached", finish_reason)
+        return None
 
     # Other methods of the class...
 
 
 
     def _create_execution_plan(self, intent: Dict[str, Any], user_id: str) -> List[Dict[str, Any]]:
-        plan = []
-        if 'contact_name' in intent:
-            plan.append({
-                "api": "contacts",
-                "action": "find_contact",
-                "params": {"name": intent['contact_name']}
-            })
-        if 'ask_preferences' in intent and intent['ask_preferences']:
-            plan.append({
-                "api": "preferences",
-                "action": "get_meeting_preferences",
-                "params": {"user_id": user_id, "ask_user": True}
-            })
-        plan.append({
-            "api": "calendar",
-            "action": "get_free_slots",
-            "params": {"user_id": user_id, "other_user_id": "PLACEHOLDER", "date": date.today().isoformat()}
-        })
-        return plan
+        skeleton = _plan_skeleton('contact_name' in intent, bool(intent.get('ask_preferences')))
+        values = {"name": intent.get('contact_name'), "user_id": user_id, "date": _today_iso()}
+        # Steps are copied because _execute_plan rewrites their params once references resolve
+        return [
+            {**step, "params": {k: values[k] if v is None else v for k, v in step['params'].items()}}
+            for step in skeleton
+        ]
 
-    def _execute_plan(self, plan: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def _execute_plan(self, plan: List[Dict[str, Any]],
+                            speculative: Optional[Dict[tuple, asyncio.Task]] = None) -> Dict[StepID, Dict[str, Any]]:
+        speculative = speculative if speculative is not None else {}
         results = {}
-        for step in plan:
-            result = self.api_executor.execute(step['api'], step['action'], step['params'])
-            results[f"{step['api']}_{step['action']}"] = result
-            if step['action'] == 'get_free_slots' and not result.get('success'):
-                self.pending_action = 'get_free_slots'
-                self.pending_action_contact_id = step['params']['other_user_id']
+        pending = list(plan)
+        # Run the plan in waves: every step whose dependencies are done executes concurrently
+        while pending:
+            wave = [s for s in pending if all(d in results for d in s['depends_on'])]
+            if not wave:
                 break
+            pending = [s for s in pending if s not in wave]
+            
+            runnable = []
+            for step in wave:
+                params = self._resolve_params(step['params'], results)
+                if params is None:
+                    # Never issue a call with an unresolved reference; the upstream error already explains it
+                    results[step['id']] = {"success": False, "error": "Skipped: an upstream step did not succeed"}
+                    continue
+                step['params'] = params
+                runnable.append(step)
+            outcomes = await asyncio.gather(*(self._execute_step(step, speculative) for step in runnable))
+            
+            for step, result in zip(runnable, outcomes):
+                results[step['id']] = result
+                if step['action'] == 'get_free_slots' and not result.get('success'):
+                    self.pending_action = 'get_free_slots'
+                    self.pending_action_contact_id = step['params']['other_user_id']
+                    pending = []
         return results
 
-    def _generate_response(self, prompt: str, results: Dict[str, Any]) -> Dict[str, Any]:
-        if "contacts_find_contact" in results and results["contacts_find_contact"].get("success"):
-            print(results)
-            if "calendar_get_free_slots" in results and results["calendar_get_free_slots"].get("success"):
-                slots = results["calendar_get_free_slots"].get("slots", [])
+    async def _execute_step(self, step: Dict[str, Any], speculative: Dict[tuple, asyncio.Task]) -> Dict[str, Any]:
+        task = speculative.pop(_speculation_key(step['api'], step['action'], step['params']), None)
+        if task is None:
+            task = self._call(step['api'], step['action'], step['params'])
+        # Only calls the plan actually uses feed the breaker; unused speculation never does
+        return await self._recorded(step['api'], task)
+
+    async def _call(self, api: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        execute_async = getattr(self.api_executor, 'execute_async', None)
+        if execute_async is not None:
+            return await execute_async(api, action, params)
+        return await asyncio.to_thread(self.api_executor.execute, api, action, params)
+
+    async def _recorded(self, api: str, call) -> Dict[str, Any]:
+        try:
+            result = await call
+        except _TRANSPORT_ERRORS:
+            self._record_outcome(api, {"success": False, "backend_error": True})
+            raise
+        self._record_outcome(api, result)
+        return result
+
+    def _record_outcome(self, api: str, result: Dict[str, Any]):
+        fail_counts = self._breaker["fail_counts"]
+        if result.get("cached"):
+            # Never reached the backend, so it says nothing about whether the backend is up
+            return
+        if not result.get("backend_error"):
+            # The backend answered, even if only to say a contact or slot was not found
+            fail_counts.pop(api, None)
+            return
+        fail_counts[api] = fail_counts.get(api, 0) + 1
+        if fail_counts[api] >= BREAKER_THRESHOLD:
+            self._breaker["open_until"] = time.monotonic() + BREAKER_COOLDOWN
+            fail_counts.clear()
+            logger.warning("API failing repeatedly; failing fast for %ss", BREAKER_COOLDOWN)
+
+    def _resolve_params(self, params: Dict[str, Any], results: Dict[StepID, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        resolved = {}
+        for key, value in params.items():
+            if not isinstance(value, StepRef):
+                resolved[key] = value
+                continue
+            upstream = results.get(value.step, {})
+            if not upstream.get('success') or value.field not in upstream:
+                return None
+            resolved[key] = upstream[value.field]
+        return resolved
+
+    def _generate_response(self, prompt: str, results: Dict[StepID, Dict[str, Any]],
+                           response_template: Optional[str] = None) -> Dict[str, Any]:
+        contact = results.get(StepID.FIND_CONTACT)
+        free_slots = results.get(StepID.GET_SLOTS)
+        if contact is not None and contact.get("success"):
+            logger.debug("plan results", extra={"results": {step.name: r for step, r in results.items()}})
+            if free_slots is not None and free_slots.get("success"):
+                slots = free_slots.get("slots", [])
                 if slots:
-                    return {"message": "Meeting slots found and processed.", "status": "success"}
+                    message = self._render_template(response_template, {
+                        "contact_name": contact.get("name", ""),
+                        "slot_count": len(slots),
+                        "first_slot": slots[0].get("start_time", "")
+                    })
+                    return {"message": message, "status": "success"}
                 else:
                     return {"message": "There are no available time slots. Would you like to try a different day?", "status": "success"}
             else:
@@ -92,8 +664,21 @@ class MeetingBookingMCPAgent:
         else:
             return {"message": "Failed to find contact.", "status": "error"}
 
+    def _render_template(self, template: Optional[str], values: Dict[str, Any]) -> str:
+        # LLM-written templates are untrusted, so they never reach str.format: only plain {name}
+        # placeholders from `values` are substituted, and anything else falls back
+        if not template:
+            return DEFAULT_SLOTS_MESSAGE
+        names = _TEMPLATE_FIELD_RE.findall(template)
+        stripped = _TEMPLATE_FIELD_RE.sub("", template)
+        if "{" in stripped or "}" in stripped or any(name not in values for name in names):
+            return DEFAULT_SLOTS_MESSAGE
+        return _TEMPLATE_FIELD_RE.sub(lambda m: str(values[m.group(1)]), template)
+
 # Example usage
 def example_google_calendar_integration():
+    from google_calendar_integration_openai import GoogleCalendarAPIExecutor
+
     credentials_path = 'credentials.json'
     openai_api_key = os.getenv('OPENAI_API_KEY') # Replace with your OpenAI API key
 
@@ -105,4 +690,6 @@ def example_google_calendar_integration():
     print(result)
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     example_google_calendar_integration()
@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    token TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    start REAL NOT NULL,
+    "end" REAL NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_range ON events (calendar_id, start, "end");
+CREATE TABLE IF NOT EXISTS contacts (
+    contact_id TEXT PRIMARY KEY,
+    names TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+"""
+
+
+class SyncStore:
+    """Local SQLite copy of calendar events and contacts, kept current with Google sync tokens."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def get_sync_state(self, name: str) -> Tuple[Optional[str], float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token, synced_at FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row if row else (None, 0.0)
+
+    def _set_sync_state(self, name: str, token: Optional[str]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sync_state (name, token, synced_at) VALUES (?, ?, ?)",
+            (name, token, time.time()))
+
+    def apply_events(self, calendar_id: str, upserts: List[Tuple[str, float, float]],
+                     deletes: List[str], token: Optional[str], full: bool = False):
+        # One transaction per sync, so the stored token always matches the stored events
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            self._conn.executemany(
+                "DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+                [(calendar_id, event_id) for event_id in deletes])
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO events (calendar_id, event_id, start, "end") VALUES (?, ?, ?, ?)',
+                [(calendar_id, event_id, start, end) for event_id, start, end in upserts])
+            self._set_sync_state(f"events:{calendar_id}", token)
+
+    def count_busy_periods(self, calendar_id: str, start: float, end: float) -> int:
+        """Count merged busy periods overlapping [start, end), as FreeBusy reports them."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT start, "end" FROM events WHERE calendar_id = ? AND start < ? AND "end" > ? ORDER BY start',
+                (calendar_id, end, start)).fetchall()
+        periods = 0
+        period_end = None
+        for event_start, event_end in rows:
+            if period_end is None or event_start > period_end:
+                periods += 1
+                period_end = event_end
+            else:
+                period_end = max(period_end, event_end)
+        return periods
+
+    def load_contacts(self) -> Tuple[Dict[str, Dict[str, Any]], Optional[str]]:
+        token, _ = self.get_sync_state("contacts")
+        with self._lock:
+            rows = self._conn.execute("SELECT contact_id, names, email FROM contacts").fetchall()
+        by_id = {
+            contact_id: {'contact_id': contact_id, 'names': tuple(json.loads(names)), 'email': email}
+            for contact_id, names, email in rows
+        }
+        return by_id, token
+
+    def apply_contacts(self, upserts: List[Dict[str, Any]], deletes: List[str],
+                       token: Optional[str], full: bool = False):
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM contacts")
+            self._conn.executemany(
+                "DELETE FROM contacts WHERE contact_id = ?", [(contact_id,) for contact_id in deletes])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO contacts (contact_id, names, email) VALUES (?, ?, ?)",
+                [(c['contact_id'], json.dumps(list(c['names'])), c['email']) for c in upserts])
+            self._set_sync_state("contacts", token)
@@ -1,15 +1,73 @@
-import json
 import os
-import openai
-from google_calendar_integration_openai import GoogleCalendarAPIExecutor
-from meeting_booking_agent import MeetingBookingMCPAgent
-from dotenv import load_dotenv
+import copy
+import uuid
+import queue
+import asyncio
+import logging
+import logging.handlers
+from prompt_toolkit import PromptSession
+from meeting_booking_agent import MeetingBookingMCPAgent, json_dumps
 from datetime import datetime
 
-load_dotenv()
+logger = logging.getLogger("meeting_agent")
 
+# Attributes every LogRecord has; anything else on a record came in through `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message"}
 
-def test_meeting_booking_agent():
+
+class JsonFormatter(logging.Formatter):
+    """Format a log record as one JSON object, including any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json_dumps(entry, default=str)
+
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the rendered traceback in exc_text instead of folding it into the message"""
+
+    def prepare(self, record):
+        # The base prepare() formats the record and drops exc_info, so formatters behind the
+        # queue would never see the traceback; render it here and leave the rest to the listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging():
+    """
+    Route agent logs through a queue so formatting and stream I/O happen on a
+    background thread instead of inside the prompt loop
+
+    Returns:
+        The started QueueListener; stop it on exit to flush pending records
+    """
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    logger.addHandler(TracebackQueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    return listener
+
+
+async def main():
     """
     Function to test the meeting booking agent with Google Calendar integration
     """
@@ -31,6 +89,9 @@ def test_meeting_booking_agent():
         return
     
     try:
+        # Imported here: it pulls in the Google client libraries, which only this path needs
+        from google_calendar_integration_openai import GoogleCalendarAPIExecutor
+
         # Create the Google Calendar API executor
         print("Initializing Google Calendar API executor...")
         executor = GoogleCalendarAPIExecutor(credentials_path)
@@ -43,38 +104,63 @@ def test_meeting_booking_agent():
         print("\nEnter prompts to test the agent. Type 'exit' to quit.")
         print("Example: 'Book a meeting with John'")
         
-        while True:
-            # Get user prompt
-            prompt = input("\nYour prompt: ")
-            
-            if prompt.lower() in ["exit", "quit", "q"]:
-                break
-            
-            # Process the prompt (using 'primary' as the user_id for Google Calendar)
-            print("\nProcessing prompt...")
-            result = agent.process_user_prompt(prompt, "primary")
-            
-            # Display the result
-            print("\nAgent response:")
-            print(json.dumps(result, indent=2))
-            
-            # If meeting was booked successfully, show details
-            if result.get("status") == "success" and "meeting" in result:
-                print("\nMeeting details:")
-                print(f"Title: {result['meeting']['title']}")
-                print(f"Time: {result['meeting']['start_time']} to {result['meeting']['end_time']}")
-                if "alternative_slots" in result and result["alternative_slots"]:
-                    print("\nAlternative slots:")
-                    for i, slot in enumerate(result["alternative_slots"]):
-                        try:
-                            start = datetime.datetime.fromisoformat(slot["start_time"].replace('Z', '+00:00'))
-                            end = datetime.datetime.fromisoformat(slot["end_time"].replace('Z', '+00:00'))
-                            print(f"{i+1}. {start.strftime('%I:%M %p')} to {end.strftime('%I:%M %p')}")
-                        except:
-                            print(f"{i+1}. {slot['start_time']} to {slot['end_time']}")
+        session = PromptSession()
+        warm_up = None
+        try:
+            while True:
+                # Refresh contacts and events in the background while the user is typing;
+                # a new warm-up starts only once the previous one has finished
+                if warm_up is None or warm_up.done():
+                    warm_up = asyncio.create_task(agent.warm_cache())
+                
+                # Get user prompt without blocking the event loop
+                try:
+                    prompt = await session.prompt_async("\nYour prompt: ")
+                except (EOFError, KeyboardInterrupt):
+                    break
+                
+                if prompt.lower() in ["exit", "quit", "q"]:
+                    break
+                
+                # Process the prompt (using 'primary' as the user_id for Google Calendar)
+                trace_id = uuid.uuid4().hex
+                logger.info("processing prompt", extra={"prompt": prompt, "trace_id": trace_id})
+                result = await agent.process_user_prompt_async(prompt, "primary", trace_id=trace_id)
+                
+                # Display the result
+                logger.info("result", extra={"result": result, "trace_id": trace_id})
+                
+                # If meeting was booked successfully, show details
+                if result.get("status") == "success" and "meeting" in result:
+                    print("\nMeeting details:")
+                    print(f"Title: {result['meeting']['title']}")
+                    print(f"Time: {result['meeting']['start_time']} to {result['meeting']['end_time']}")
+                    if "alternative_slots" in result and result["alternative_slots"]:
+                        print("\nAlternative slots:")
+                        for i, slot in enumerate(result["alternative_slots"]):
+                            try:
+                                start = datetime.datetime.fromisoformat(slot["start_time"].replace('Z', '+00:00'))
+                                end = datetime.datetime.fromisoformat(slot["end_time"].replace('Z', '+00:00'))
+                                print(f"{i+1}. {start.strftime('%I:%M %p')} to {end.strftime('%I:%M %p')}")
+                            except:
+                                print(f"{i+1}. {slot['start_time']} to {slot['end_time']}")
+        finally:
+            # Never exit the loop with the warm-up task still pending
+            if warm_up is not None:
+                warm_up.cancel()
+                try:
+                    await warm_up
+                except asyncio.CancelledError:
+                    pass
     
     except Exception as e:
         print(f"\nError during testing: {str(e)}")
 
 if __name__ == "__main__":
-    test_meeting_booking_agent()
+    from dotenv import load_dotenv
+    load_dotenv()
+    listener = configure_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        listener.stop()
@@ -0,0 +1,164 @@
+import json
+import random
+import time
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from google_calendar_integration_openai import GoogleCalendarAPIExecutor, _is_backend_error
+from sync_store import SyncStore
+
+DAY = "2024-05-02"
+CONTACT_EMAIL = "ann@example.com"
+
+
+def make_executor(**attrs):
+    with mock.patch.object(GoogleCalendarAPIExecutor, "_authenticate"):
+        executor = GoogleCalendarAPIExecutor("credentials.json", cache_path=None)
+    # Requests are executed directly; the retry loop needs googleapiclient's HttpError
+    executor._execute_with_retry = lambda request: request.execute()
+    executor.calendar_service = mock.MagicMock()
+    executor.people_service = mock.MagicMock()
+    for name, value in attrs.items():
+        setattr(executor, name, value)
+    return executor
+
+
+def at(clock: str) -> str:
+    return f"{DAY}T{clock}Z"
+
+
+def free_slots(primary_busy, other_busy=()):
+    executor = make_executor()
+    executor._get_contact_details = lambda contact_id: {"success": True, "email": CONTACT_EMAIL}
+    executor.calendar_service.freebusy.return_value.query.return_value.execute.return_value = {
+        "calendars": {
+            "primary": {"busy": [{"start": s, "end": e} for s, e in primary_busy]},
+            CONTACT_EMAIL: {"busy": [{"start": s, "end": e} for s, e in other_busy]},
+        }
+    }
+    result = executor.execute("calendar", "get_free_slots",
+                              {"user_id": "primary", "other_user_id": "42", "date": DAY})
+    assert result["success"], result
+    return [slot["start_time"][11:16] for slot in result["slots"]]
+
+
+def brute_force_slots(busy):
+    day_start = datetime.fromisoformat(f"{DAY}T09:00:00+00:00")
+    periods = [(datetime.fromisoformat(s.replace("Z", "+00:00")), datetime.fromisoformat(e.replace("Z", "+00:00")))
+               for s, e in busy]
+    slots = []
+    for i in range(16):
+        start = day_start + timedelta(minutes=30 * i)
+        end = start + timedelta(minutes=30)
+        if all(e <= start or s >= end for s, e in periods):
+            slots.append(start.strftime("%H:%M"))
+    return slots
+
+
+ALL_SLOTS = brute_force_slots([])
+
+
+class FreeSlotsTest(unittest.TestCase):
+    CASES = [
+        ("no busy periods", [], [], ALL_SLOTS),
+        ("whole slot", [(at("10:00:00"), at("10:30:00"))], [], [s for s in ALL_SLOTS if s != "10:00"]),
+        ("overlapping across calendars", [(at("10:00:00"), at("11:00:00"))], [(at("10:30:00"), at("11:30:00"))],
+         [s for s in ALL_SLOTS if s not in ("10:00", "10:30", "11:00")]),
+        ("adjacent periods", [(at("12:00:00"), at("12:30:00")), (at("12:30:00"), at("13:00:00"))], [],
+         [s for s in ALL_SLOTS if s not in ("12:00", "12:30")]),
+        ("starts and ends mid-slot", [(at("13:10:00"), at("13:40:00"))], [],
+         [s for s in ALL_SLOTS if s not in ("13:00", "13:30")]),
+        ("seconds round outwards", [(at("09:29:30"), at("10:00:01"))], [],
+         [s for s in ALL_SLOTS if s not in ("09:00", "09:30", "10:00")]),
+        ("outside working hours", [(f"{DAY}T06:00:00Z", at("08:59:59")), (at("17:00:00"), at("20:00:00"))], [],
+         ALL_SLOTS),
+        ("straddling the day edges", [(f"{DAY}T08:00:00Z", at("09:15:00")), (at("16:45:00"), at("18:00:00"))], [],
+         ALL_SLOTS[1:-1]),
+        ("whole day", [], [(f"{DAY}T00:00:00Z", "2024-05-03T00:00:00Z")], []),
+        ("offset timestamps", [("2024-05-02T15:30:00+05:30", "2024-05-02T16:00:00+05:30")], [],
+         [s for s in ALL_SLOTS if s != "10:00"]),
+    ]
+
+    def test_table(self):
+        for name, primary, other, expected in self.CASES:
+            with self.subTest(name):
+                self.assertEqual(free_slots(primary, other), expected)
+
+    def test_matches_brute_force_on_random_busy_sets(self):
+        rng = random.Random(1234)
+        day_start = datetime.fromisoformat(f"{DAY}T07:00:00+00:00")
+        for _ in range(300):
+            busy = []
+            for _ in range(rng.randint(0, 8)):
+                start = day_start + timedelta(seconds=rng.randint(0, 12 * 3600))
+                end = start + timedelta(seconds=rng.randint(1, 3 * 3600))
+                busy.append((start.strftime("%Y-%m-%dT%H:%M:%SZ"), end.strftime("%Y-%m-%dT%H:%M:%SZ")))
+            split = rng.randint(0, len(busy))
+            with self.subTest(busy=busy):
+                self.assertEqual(free_slots(busy[:split], busy[split:]), brute_force_slots(busy))
+
+
+class BackendErrorTest(unittest.TestCase):
+    @staticmethod
+    def http_error(status, body=None):
+        error = Exception("HttpError %s" % status)
+        error.resp = SimpleNamespace(status=status)
+        error.content = json.dumps(body).encode() if body is not None else b""
+        return error
+
+    def test_outages_throttling_and_lost_auth_count(self):
+        for error in (TimeoutError(), ConnectionError(), self.http_error(503), self.http_error(429),
+                      self.http_error(401),
+                      self.http_error(403, {"error": {"errors": [{"reason": "rateLimitExceeded"}]}}),
+                      self.http_error(403, {"error": {"errors": [{"reason": "quotaExceeded"}]}}),
+                      self.http_error(403, {"error": {"details": [{"reason": "RATE_LIMIT_EXCEEDED"}]}})):
+            with self.subTest(error=error):
+                self.assertTrue(_is_backend_error(error))
+
+    def test_answered_refusals_do_not(self):
+        for error in (self.http_error(404), self.http_error(400), self.http_error(403),
+                      self.http_error(403, {"error": {"errors": [{"reason": "forbidden"}]}}),
+                      ValueError("bad date")):
+            with self.subTest(error=error):
+                self.assertFalse(_is_backend_error(error))
+
+
+class WarmCacheTest(unittest.TestCase):
+    def test_events_sync_only_when_stale_or_past_ttl(self):
+        store = SyncStore(":memory:")
+        executor = make_executor(_store=store, _ensure_contacts_cache=mock.Mock())
+        executor._sync_events = mock.Mock(
+            side_effect=lambda calendar_id: store.apply_events(calendar_id, [], [], "token"))
+        executor.warm_cache()
+        executor.warm_cache()
+        self.assertEqual(executor._sync_events.call_count, 1)
+        executor._events_stale = True
+        executor.warm_cache()
+        self.assertEqual(executor._sync_events.call_count, 2)
+        self.assertFalse(executor._events_stale)
+        with mock.patch("google_calendar_integration_openai.time.time",
+                        return_value=time.time() + GoogleCalendarAPIExecutor.EVENTS_SYNC_TTL + 1):
+            executor.warm_cache()
+        self.assertEqual(executor._sync_events.call_count, 3)
+
+
+class EventTimestampTest(unittest.TestCase):
+    def test_all_day_events_use_the_calendar_zone(self):
+        executor = make_executor()
+        kolkata = executor._zone("Asia/Kolkata")
+        self.assertEqual(executor._event_timestamp({"date": "2024-05-02"}, kolkata),
+                         datetime.fromisoformat("2024-05-01T18:30:00+00:00").timestamp())
+        self.assertEqual(executor._event_timestamp({"date": "2024-05-02"}, executor._zone(None)),
+                         datetime.fromisoformat("2024-05-02T00:00:00+00:00").timestamp())
+
+    def test_timed_events_keep_their_offset(self):
+        executor = make_executor()
+        self.assertEqual(executor._event_timestamp({"dateTime": "2024-05-02T10:00:00+05:30"},
+                                                   executor._zone("America/New_York")),
+                         datetime.fromisoformat("2024-05-02T04:30:00+00:00").timestamp())
+
+
+if __name__ == "__main__":
+    unittest.main()
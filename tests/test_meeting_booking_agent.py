@@ -0,0 +1,387 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from meeting_booking_agent import (BREAKER_THRESHOLD, DEFAULT_SLOTS_MESSAGE, CachingExecutor, IntentCache,
+                                   MeetingBookingMCPAgent, StepID, StepRef, _BYPASS_CACHE, _Speculation,
+                                   _intent_cache_key, _regex_intent, _speculation_key)
+
+
+class FakeExecutor:
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.calls = []
+
+    def execute(self, api_name, action, params):
+        self.calls.append(action)
+        return self.results.get(action, {"success": True, "contact_id": "42", "slots": []})
+
+
+def make_agent(executor):
+    return MeetingBookingMCPAgent(executor, "test-key", intent_cache_path=None)
+
+
+class RegexIntentTest(unittest.TestCase):
+    def test_books_with_capitalised_contact(self):
+        self.assertEqual(_regex_intent("Book a meeting with Chinmay Sir"),
+                         {"action": "book_meeting", "contact_name": "Chinmay Sir", "ask_preferences": False})
+
+    def test_contact_stops_at_trailing_time(self):
+        for prompt in ("Set up a call with Priya next week", "Book a meeting with Priya tomorrow",
+                       "Book a meeting with Priya Tomorrow", "Book a meeting with Priya at 3pm."):
+            with self.subTest(prompt=prompt):
+                self.assertEqual(_regex_intent(prompt)["contact_name"], "Priya")
+
+    def test_keeps_titles_but_not_final_punctuation(self):
+        self.assertEqual(_regex_intent("schedule a call with Dr. Mehta")["contact_name"], "Dr. Mehta")
+        self.assertEqual(_regex_intent("Book a meeting with John.")["contact_name"], "John")
+
+    def test_ambiguous_contacts_are_left_to_the_llm(self):
+        for prompt in ("book a meeting with the team at Acme", "Set up a call with Priya next",
+                       "book a meeting with priya"):
+            with self.subTest(prompt=prompt):
+                self.assertIsNone(_regex_intent(prompt))
+
+    def test_other_intents(self):
+        self.assertEqual(_regex_intent("cancel my meeting with Ann on Friday"),
+                         {"action": "cancel_meeting", "contact_name": "Ann"})
+        self.assertEqual(_regex_intent("Move the meeting"), {"action": "reschedule_meeting"})
+        self.assertEqual(_regex_intent("show my calendar"), {"action": "list_meetings"})
+
+
+class CachingExecutorTest(unittest.TestCase):
+    SLOTS = {"user_id": "primary", "other_user_id": "42", "date": "2024-05-02"}
+
+    def setUp(self):
+        self.executor = FakeExecutor()
+        self.cache = CachingExecutor(self.executor)
+        self.clock = 1000.0
+        patcher = mock.patch("meeting_booking_agent.time.monotonic", lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_are_served_until_their_ttl_expires(self):
+        self.cache.execute("calendar", "get_free_slots", self.SLOTS)
+        self.clock += CachingExecutor.TTLS[("calendar", "get_free_slots")] - 1
+        self.cache.execute("calendar", "get_free_slots", dict(reversed(list(self.SLOTS.items()))))
+        self.assertEqual(self.executor.calls, ["get_free_slots"])
+        self.clock += 2
+        self.cache.execute("calendar", "get_free_slots", self.SLOTS)
+        self.assertEqual(self.executor.calls, ["get_free_slots"] * 2)
+
+    def test_failures_and_uncached_actions_pass_through(self):
+        self.executor.results["find_contact"] = {"success": False, "error": "No contact found with name 'Ann'"}
+        for _ in range(2):
+            self.cache.execute("contacts", "find_contact", {"name": "Ann"})
+            self.cache.execute("preferences", "get_meeting_preferences", {"user_id": "primary"})
+        self.assertEqual(self.executor.calls, ["find_contact", "get_meeting_preferences"] * 2)
+
+    def test_successful_booking_invalidates_free_slots_only(self):
+        self.cache.execute("calendar", "get_free_slots", self.SLOTS)
+        self.cache.execute("contacts", "find_contact", {"name": "Ann"})
+        self.cache.execute("calendar", "book_meeting", {"title": "Sync"})
+        self.cache.execute("calendar", "get_free_slots", self.SLOTS)
+        self.cache.execute("contacts", "find_contact", {"name": "Ann"})
+        self.assertEqual(self.executor.calls, ["get_free_slots", "find_contact", "book_meeting", "get_free_slots"])
+
+    def test_overflow_evicts_the_least_recently_used_entry(self):
+        self.cache.MAX_ENTRIES = 2
+        for name in ("Ann", "Bob"):
+            self.cache.execute("contacts", "find_contact", {"name": name})
+        self.cache.execute("contacts", "find_contact", {"name": "Ann"})
+        self.cache.execute("contacts", "find_contact", {"name": "Cy"})
+        self.executor.calls.clear()
+        for name in ("Ann", "Cy", "Bob"):
+            self.cache.execute("contacts", "find_contact", {"name": name})
+        self.assertEqual(self.executor.calls, ["find_contact"])
+        self.assertEqual(len(self.cache._cache), 2)
+
+
+class SyncFacadeTest(unittest.TestCase):
+    def test_worker_threads_outlive_each_prompt(self):
+        threads = []
+
+        class ThreadRecordingExecutor(FakeExecutor):
+            def execute(self, api_name, action, params):
+                threads.append(threading.current_thread())
+                return super().execute(api_name, action, params)
+
+        agent = make_agent(ThreadRecordingExecutor())
+        agent.process_user_prompt("Book a meeting with Ann", "primary")
+        agent.process_user_prompt("Book a meeting with Bob", "primary")
+        self.assertTrue(threads)
+        self.assertTrue(all(thread.is_alive() for thread in threads))
+
+
+class SpeculationTest(unittest.TestCase):
+    def test_found_contact_chains_free_slot_speculation(self):
+        executor = FakeExecutor()
+
+        async def run():
+            speculative = _Speculation()
+            make_agent(executor)._speculate(speculative, "primary", "contacts", "find_contact", {"name": "Ann"})
+            await next(iter(speculative.values()))
+            await asyncio.gather(*speculative.values())
+            return speculative
+
+        self.assertEqual(len(asyncio.run(run())), 2)
+        self.assertEqual(executor.calls, ["find_contact", "get_free_slots"])
+
+    def test_closed_speculation_starts_no_follow_up(self):
+        executor = FakeExecutor()
+
+        async def run():
+            speculative = _Speculation()
+            make_agent(executor)._speculate(speculative, "primary", "contacts", "find_contact", {"name": "Ann"})
+            task = next(iter(speculative.values()))
+            speculative.closed = True
+            await task
+            await asyncio.sleep(0)
+            return speculative
+
+        self.assertEqual(len(asyncio.run(run())), 1)
+        self.assertEqual(executor.calls, ["find_contact"])
+
+    def test_speculation_runs_on_its_own_pool(self):
+        threads = []
+
+        class ThreadRecordingExecutor(FakeExecutor):
+            def execute(self, api_name, action, params):
+                threads.append(threading.current_thread().name)
+                return super().execute(api_name, action, params)
+
+        agent = make_agent(ThreadRecordingExecutor({"find_contact": {"success": False, "error": "not found"}}))
+
+        async def run():
+            speculative = _Speculation()
+            agent._speculate(speculative, "primary", "contacts", "find_contact", {"name": "Ann"})
+            await asyncio.gather(*speculative.values())
+
+        asyncio.run(run())
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith("meeting-agent-speculation"))
+
+    def test_disk_cache_hit_skips_speculation(self):
+        prompt = "could you line something up with Ann"
+        self.assertIsNone(_regex_intent(prompt))
+        with tempfile.TemporaryDirectory() as directory:
+            agent = MeetingBookingMCPAgent(FakeExecutor(), "test-key",
+                                           intent_cache_path=os.path.join(directory, "intents.db"))
+            agent._intent_cache.set(_intent_cache_key(prompt), {"action": "book_meeting", "contact_name": "Ann"})
+            agent._openai = FakeOpenAI()
+            with mock.patch.object(agent, "_speculate") as speculate:
+                agent.process_user_prompt(prompt, "primary")
+            speculate.assert_not_called()
+
+    def test_key_ignores_param_order_and_accepts_lists(self):
+        self.assertEqual(_speculation_key("calendar", "book_meetings", {"a": ["x"], "b": 1}),
+                         _speculation_key("calendar", "book_meetings", {"b": 1, "a": ["x"]}))
+
+
+class PlanExecutionTest(unittest.TestCase):
+    INTENT = {"action": "book_meeting", "contact_name": "Ann", "ask_preferences": False}
+
+    def run_plan(self, executor):
+        agent = make_agent(executor)
+        return asyncio.run(agent._execute_plan(agent._create_execution_plan(self.INTENT, "primary")))
+
+    def test_contact_id_flows_into_free_slot_query(self):
+        executor = FakeExecutor()
+        agent = make_agent(executor)
+        plan = agent._create_execution_plan(self.INTENT, "primary")
+        results = asyncio.run(agent._execute_plan(plan))
+        self.assertEqual(executor.calls, ["find_contact", "get_free_slots"])
+        self.assertEqual(plan[-1]["params"]["other_user_id"], "42")
+        self.assertTrue(results[StepID.GET_SLOTS]["success"])
+
+    def test_dependent_step_is_skipped_when_upstream_fails_or_lacks_the_field(self):
+        for contact in ({"success": False, "error": "No contact found with name 'Ann'"},
+                        {"success": True, "name": "Ann"}):
+            with self.subTest(contact=contact):
+                executor = FakeExecutor({"find_contact": contact})
+                results = self.run_plan(executor)
+                self.assertEqual(executor.calls, ["find_contact"])
+                self.assertFalse(results[StepID.GET_SLOTS]["success"])
+                self.assertIn("Skipped", results[StepID.GET_SLOTS]["error"])
+
+    def test_resolve_params(self):
+        agent = make_agent(FakeExecutor())
+        params = {"user_id": "primary", "other_user_id": StepRef(StepID.FIND_CONTACT, "contact_id")}
+        self.assertEqual(agent._resolve_params(params, {StepID.FIND_CONTACT: {"success": True, "contact_id": "7"}}),
+                         {"user_id": "primary", "other_user_id": "7"})
+        self.assertIsNone(agent._resolve_params(params, {}))
+        self.assertEqual(agent._resolve_params({"user_id": "primary"}, {}), {"user_id": "primary"})
+
+
+class RenderTemplateTest(unittest.TestCase):
+    VALUES = {"contact_name": "Ann", "slot_count": 3, "first_slot": "2024-05-02T09:00:00Z"}
+
+    def render(self, template):
+        return make_agent(FakeExecutor())._render_template(template, self.VALUES)
+
+    def test_substitutes_whitelisted_placeholders(self):
+        self.assertEqual(self.render("{slot_count} slots with {contact_name}, first {first_slot}"),
+                         "3 slots with Ann, first 2024-05-02T09:00:00Z")
+
+    def test_rejects_anything_but_plain_placeholders(self):
+        for template in ("{contact_name.__class__}", "{contact_name[0]}", "{slot_count:>10}",
+                         "{unknown}", "stray { brace", "stray } brace", "", None):
+            with self.subTest(template=template):
+                self.assertEqual(self.render(template), DEFAULT_SLOTS_MESSAGE)
+
+
+def stream_of(parts, finish_reason):
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part), finish_reason=None)])
+              for part in parts]
+    chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None),
+                                                           finish_reason=finish_reason)]))
+    return FakeStream(chunks)
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeOpenAI:
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        return self.streams.pop(0)
+
+
+REPLY = json.dumps({"intent": {"action": "book_meeting", "contact_name": "Ann", "ask_preferences": False},
+                    "response_template": "{slot_count} slots with {contact_name}"})
+
+
+class IntentCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "intents.db")
+        self.clock = 1000.0
+        patcher = mock.patch("meeting_booking_agent.time.time", lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_set_and_expiry(self):
+        cache = IntentCache(self.path, ttl=60)
+        self.assertIsNone(cache.get("k"))
+        cache.set("k", {"action": "book_meeting", "contact_name": "Ann"})
+        self.clock += 59
+        self.assertEqual(IntentCache(self.path, ttl=60).get("k"), {"action": "book_meeting", "contact_name": "Ann"})
+        self.clock += 1
+        self.assertIsNone(cache.get("k"))
+
+    def test_set_purges_expired_rows(self):
+        cache = IntentCache(self.path, ttl=60)
+        cache.set("old", {"action": "list_meetings"})
+        self.clock += 60
+        cache.set("new", {"action": "list_meetings"})
+        self.assertEqual([row[0] for row in cache._conn.execute("SELECT key FROM intents")], ["new"])
+
+
+class IntentClassificationTest(unittest.TestCase):
+    PROMPT = "meet ann"
+
+    def make_agent(self, *streams):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        agent = MeetingBookingMCPAgent(FakeExecutor(), "test-key",
+                                       intent_cache_path=os.path.join(directory.name, "intents.db"))
+        agent._openai = FakeOpenAI(*streams)
+        return agent
+
+    def test_complete_reply_is_cached(self):
+        agent = self.make_agent(stream_of([REPLY[:20], REPLY[20:]], "stop"))
+        first = agent._classify_and_cache(self.PROMPT)
+        self.assertEqual(first["contact_name"], "Ann")
+        self.assertEqual(agent._cached_intent(self.PROMPT), first)
+        self.assertEqual(agent._openai.streams, [])
+
+    def test_truncated_reply_is_not_cached(self):
+        agent = self.make_agent(stream_of([REPLY[:40]], "length"), stream_of([REPLY], "stop"))
+        self.assertEqual(agent._classify_and_cache(self.PROMPT), {"action": "unknown"})
+        self.assertIsNone(agent._cached_intent(self.PROMPT))
+        self.assertEqual(agent._classify_and_cache(self.PROMPT)["action"], "book_meeting")
+
+    def test_bypass_cache_skips_the_lookup(self):
+        agent = self.make_agent(stream_of([REPLY], "stop"))
+        agent._classify_and_cache(self.PROMPT)
+        token = _BYPASS_CACHE.set(True)
+        try:
+            self.assertIsNone(agent._cached_intent(self.PROMPT))
+        finally:
+            _BYPASS_CACHE.reset(token)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    UNAVAILABLE = "Calendar service unavailable, retry shortly"
+
+    def run_prompts(self, executor, count):
+        agent = make_agent(executor)
+        messages = [agent.process_user_prompt("Book a meeting with Ann", "primary")["message"]
+                    for _ in range(count)]
+        return agent, messages
+
+    def test_not_found_results_do_not_open_the_breaker(self):
+        executor = FakeExecutor({"find_contact": {"success": False, "error": "No contact found with name 'Ann'"}})
+        agent, messages = self.run_prompts(executor, BREAKER_THRESHOLD + 2)
+        self.assertNotIn(self.UNAVAILABLE, messages)
+        self.assertEqual(agent._breaker["fail_counts"], {})
+
+    def test_backend_errors_open_the_breaker(self):
+        executor = FakeExecutor({"find_contact": {"success": False, "error": "Error finding contact: 503",
+                                                  "backend_error": True}})
+        _, messages = self.run_prompts(executor, BREAKER_THRESHOLD + 1)
+        self.assertNotIn(self.UNAVAILABLE, messages[:BREAKER_THRESHOLD])
+        self.assertEqual(messages[-1], self.UNAVAILABLE)
+        self.assertEqual(len(executor.calls), BREAKER_THRESHOLD)
+
+    def test_calendar_outage_opens_the_breaker_despite_cached_contacts(self):
+        executor = FakeExecutor({"get_free_slots": {"success": False, "error": "Error finding free slots: 503",
+                                                    "backend_error": True}})
+        _, messages = self.run_prompts(executor, BREAKER_THRESHOLD + 1)
+        self.assertEqual(messages[-1], self.UNAVAILABLE)
+        self.assertEqual(executor.calls, ["find_contact"] + ["get_free_slots"] * BREAKER_THRESHOLD)
+
+    def test_live_contact_lookups_do_not_reset_calendar_failures(self):
+        agent = make_agent(FakeExecutor())
+        for _ in range(BREAKER_THRESHOLD - 1):
+            agent._record_outcome("calendar", {"success": False, "backend_error": True})
+            agent._record_outcome("contacts", {"success": True, "contact_id": "42"})
+        self.assertEqual(agent._breaker["open_until"], 0.0)
+        agent._record_outcome("calendar", {"success": False, "backend_error": True})
+        self.assertGreater(agent._breaker["open_until"], 0.0)
+
+    def test_unused_speculation_is_not_recorded(self):
+        executor = FakeExecutor({"find_contact": {"success": False, "error": "timeout", "backend_error": True}})
+        agent = make_agent(executor)
+
+        async def run():
+            speculative = _Speculation()
+            for name in ("Ann", "Bob", "Cy", "Di", "Ed", "Flo"):
+                agent._speculate(speculative, "primary", "contacts", "find_contact", {"name": name})
+            await asyncio.gather(*speculative.values())
+
+        asyncio.run(run())
+        self.assertEqual(len(executor.calls), 6)
+        self.assertEqual(agent._breaker, {"fail_counts": {}, "open_until": 0.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from sync_store import SyncStore
+
+HOUR = 3600.0
+
+
+class SyncStoreEventsTest(unittest.TestCase):
+    def setUp(self):
+        self.store = SyncStore(":memory:")
+        self.store.apply_events("primary", [("a", 10 * HOUR, 11 * HOUR), ("b", 12 * HOUR, 13 * HOUR)],
+                                [], "token-1", full=True)
+
+    def event_ids(self):
+        return sorted(row[0] for row in self.store._conn.execute(
+            "SELECT event_id FROM events WHERE calendar_id = 'primary'"))
+
+    def test_full_sync_records_token(self):
+        self.assertEqual(self.event_ids(), ["a", "b"])
+        self.assertEqual(self.store.get_sync_state("events:primary")[0], "token-1")
+        self.assertEqual(self.store.get_sync_state("events:other"), (None, 0.0))
+
+    def test_incremental_sync_upserts_and_deletes(self):
+        self.store.apply_events("primary", [("b", 14 * HOUR, 15 * HOUR), ("c", 16 * HOUR, 17 * HOUR)],
+                                ["a", "missing"], "token-2")
+        self.assertEqual(self.event_ids(), ["b", "c"])
+        self.assertEqual(self.store.count_busy_periods("primary", 12 * HOUR, 13 * HOUR), 0)
+        self.assertEqual(self.store.count_busy_periods("primary", 14 * HOUR, 15 * HOUR), 1)
+        self.assertEqual(self.store.get_sync_state("events:primary")[0], "token-2")
+
+    def test_full_sync_replaces_previous_events(self):
+        self.store.apply_events("primary", [("c", 16 * HOUR, 17 * HOUR)], [], "token-3", full=True)
+        self.assertEqual(self.event_ids(), ["c"])
+
+    def test_full_sync_leaves_other_calendars_alone(self):
+        self.store.apply_events("other", [("x", 10 * HOUR, 11 * HOUR)], [], "token-x", full=True)
+        self.store.apply_events("primary", [], [], "token-4", full=True)
+        self.assertEqual(self.store.count_busy_periods("other", 10 * HOUR, 11 * HOUR), 1)
+
+    def test_count_busy_periods_overlap(self):
+        cases = [
+            ((10 * HOUR, 11 * HOUR), 1),
+            ((10.5 * HOUR, 12.5 * HOUR), 2),
+            ((9 * HOUR, 10 * HOUR), 0),
+            ((11 * HOUR, 12 * HOUR), 0),
+            ((10.9 * HOUR, 11.1 * HOUR), 1),
+            ((9 * HOUR, 14 * HOUR), 2),
+        ]
+        for (start, end), expected in cases:
+            with self.subTest(start=start, end=end):
+                self.assertEqual(self.store.count_busy_periods("primary", start, end), expected)
+
+
+    def test_overlapping_and_touching_events_merge_into_one_period(self):
+        self.store.apply_events("primary", [("c", 10.5 * HOUR, 12 * HOUR), ("d", 13 * HOUR, 14 * HOUR)],
+                                [], "token-5")
+        self.assertEqual(self.store.count_busy_periods("primary", 9 * HOUR, 15 * HOUR), 1)
+        self.store.apply_events("primary", [("e", 15 * HOUR, 16 * HOUR)], [], "token-6")
+        self.assertEqual(self.store.count_busy_periods("primary", 9 * HOUR, 17 * HOUR), 2)
+
+
+class SyncStoreContactsTest(unittest.TestCase):
+    def test_contacts_round_trip_with_deletes(self):
+        store = SyncStore(":memory:")
+        store.apply_contacts([{"contact_id": "1", "names": ("Ann", "Annie"), "email": "ann@example.com"},
+                              {"contact_id": "2", "names": ("Bob",), "email": ""}], [], "c-1", full=True)
+        store.apply_contacts([], ["2"], "c-2")
+        by_id, token = store.load_contacts()
+        self.assertEqual(by_id, {"1": {"contact_id": "1", "names": ("Ann", "Annie"), "email": "ann@example.com"}})
+        self.assertEqual(token, "c-2")
+
+
+if __name__ == "__main__":
+    unittest.main()